@@ -0,0 +1,22 @@
+# Author - Sindre E. Hinderaker
+# Description - Stand-in for the Fusion 360 adsk package, to run and benchmark the scripts outside Fusion 360.
+#               Models the objects the scripts use (data folders, documents, sketches, features and exports)
+#               without any real geometry. API calls are counted, and can be given simulated latencies
+#               (see adsk._runtime).
+
+from . import _runtime
+
+_autoTerminate = True
+
+
+def autoTerminate(value: bool):
+    global _autoTerminate
+    _autoTerminate = value
+
+
+def terminate():
+    pass
+
+
+def doEvents():
+    _runtime.process_events()
@@ -0,0 +1,133 @@
+# Author - Sindre E. Hinderaker
+# Description - Bookkeeping for the stand-in adsk package: API-call counts, simulated latencies and
+#               the custom-event queue. Not part of the Fusion 360 API.
+
+import time, functools, threading, collections
+
+# Number of calls to each API method, by name (e.g. 'Documents.open')
+calls = collections.Counter()
+
+# Simulated latency of each API method [s], by name. Set by the benchmarks, e.g. latency['Documents.open'] = 0.3
+latency = {}
+
+# Rough latencies of the slowest Fusion 360 API methods [s], used by the benchmarks scaled by --latency-scale
+fusionLatency = {
+    'Data.findFileById': 0.05,
+    'DataFolder.dataFiles': 0.02,
+    'DataFolder.dataFolders': 0.02,
+    'Documents.open': 0.3,
+    'Document.close': 0.05,
+    'ExportManager.execute': 0.2,
+    'ImportManager.importToTarget2': 0.1,
+    'Occurrences.addNewComponent': 0.01,
+    'Occurrences.addExistingComponent': 0.002,
+    'Sketches.add': 0.005,
+    'SketchTexts.add': 0.005,
+    'ExtrudeFeatures.add': 0.02,
+    'ExtrudeFeatures.addSimple': 0.02,
+    'ShellFeatures.add': 0.05,
+    'ConstructionPlanes.add': 0.002,
+    'TemporaryBRepManager.booleanOperation': 0.005,
+    'BRepBodies.add': 0.01,
+    'SurfaceEvaluator.isParameterOnFace': 0.0001,
+    'UserParameters.add': 0.001,
+}
+
+# Custom events fired with Application.fireCustomEvent, handled by adsk.doEvents (main thread)
+events = collections.deque()
+_lock = threading.Lock()
+
+
+def api(function):
+    """Counts the calls to an API method, and simulates its latency."""
+    name = function.__qualname__
+
+    @functools.wraps(function)
+    def wrapper(*args, **kwargs):
+        calls[name] += 1
+        delay = latency.get(name)
+        if delay:
+            time.sleep(delay)
+        return function(*args, **kwargs)
+    return wrapper
+
+
+def api_property(function) -> property:
+    """Read-only property that is counted as an API call, like every property access in Fusion 360."""
+    return property(api(function))
+
+
+def reset():
+    """Clears the call counts, latencies and pending events."""
+    calls.clear()
+    latency.clear()
+    with _lock:
+        events.clear()
+
+
+def fire(handlers: list, args):
+    """Queues a custom event, to be handled on the main thread."""
+    with _lock:
+        events.append((handlers, args))
+
+
+def process_events():
+    """Handles the queued custom events, like Fusion 360 does between API calls on the main thread."""
+    while True:
+        with _lock:
+            if not events:
+                return
+            (handlers, args) = events.popleft()
+        for handler in list(handlers):
+            handler.notify(args)
+
+
+_tokens = collections.Counter()
+
+def token(kind: str) -> str:
+    """New entity token for an entity of the given kind."""
+    _tokens[kind] += 1
+    return f'{kind}:{_tokens[kind]}'
+
+
+class Base:
+    """Base of the API classes, with objectType, classType and cast."""
+    _namespace = 'core'
+
+    @classmethod
+    def classType(cls) -> str:
+        return f'adsk::{cls._namespace}::{cls.__name__}'
+
+    @property
+    def objectType(self) -> str:
+        return self.classType()
+
+    @property
+    def isValid(self) -> bool:
+        return True
+
+    @classmethod
+    def cast(cls, obj):
+        return obj if isinstance(obj, cls) else None
+
+
+class Collection(Base):
+    """Read-only API collection, with count, item() and iteration."""
+    def __init__(self, items=None):
+        self._items = list(items or [])
+
+    @property
+    def count(self) -> int:
+        return len(self._items)
+
+    def item(self, index: int):
+        return self._items[index] if 0 <= index < len(self._items) else None
+
+    def __iter__(self):
+        return iter(list(self._items))
+
+    def __len__(self):
+        return len(self._items)
+
+    def __getitem__(self, index):
+        return self._items[index]
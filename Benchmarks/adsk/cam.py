@@ -0,0 +1,2 @@
+# Author - Sindre E. Hinderaker
+# Description - Stand-in for adsk.cam. The scripts import it, but don't use it.
@@ -0,0 +1,601 @@
+# Author - Sindre E. Hinderaker
+# Description - Stand-in for adsk.core: application, user interface, data, documents, geometry and events.
+
+import os, math
+from ._runtime import Base, Collection, api, api_property, fire, token
+
+
+# ENUMERATIONS -----------------------------------------------------------------
+
+class MessageBoxButtonTypes:
+    OKButtonType = 0
+    OKCancelButtonType = 1
+    RetryCancelButtonType = 2
+    YesNoButtonType = 3
+    YesNoCancelButtonType = 4
+
+class DialogResults:
+    DialogError = -1
+    DialogOK = 0
+    DialogCancel = 1
+    DialogYes = 2
+    DialogNo = 3
+
+class HorizontalAlignments:
+    LeftHorizontalAlignment = 0
+    CenterHorizontalAlignment = 1
+    RightHorizontalAlignment = 2
+
+class VerticalAlignments:
+    TopVerticalAlignment = 0
+    MiddleVerticalAlignment = 1
+    BottomVerticalAlignment = 2
+
+class DropDownStyles:
+    CheckBoxDropDownStyle = 0
+    TextListDropDownStyle = 1
+    LabeledIconDropDownStyle = 2
+
+
+# GEOMETRY ---------------------------------------------------------------------
+
+class Point2D(Base):
+    def __init__(self, x=0.0, y=0.0):
+        self.x, self.y = x, y
+
+    @staticmethod
+    def create(x=0.0, y=0.0) -> 'Point2D':
+        return Point2D(x, y)
+
+    def asArray(self) -> list:
+        return [self.x, self.y]
+
+
+class Point3D(Base):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0) -> 'Point3D':
+        return Point3D(x, y, z)
+
+    def copy(self) -> 'Point3D':
+        return Point3D(self.x, self.y, self.z)
+
+    def asArray(self) -> list:
+        return [self.x, self.y, self.z]
+
+    def translateBy(self, vector: 'Vector3D') -> bool:
+        self.x, self.y, self.z = self.x + vector.x, self.y + vector.y, self.z + vector.z
+        return True
+
+    def vectorTo(self, point: 'Point3D') -> 'Vector3D':
+        return Vector3D(point.x - self.x, point.y - self.y, point.z - self.z)
+
+    def distanceTo(self, point: 'Point3D') -> float:
+        return self.vectorTo(point).length
+
+    def transformBy(self, matrix: 'Matrix3D') -> bool:
+        (self.x, self.y, self.z) = matrix._apply(self.asArray(), 1)
+        return True
+
+
+class Vector3D(Base):
+    def __init__(self, x=0.0, y=0.0, z=0.0):
+        self.x, self.y, self.z = x, y, z
+
+    @staticmethod
+    def create(x=0.0, y=0.0, z=0.0) -> 'Vector3D':
+        return Vector3D(x, y, z)
+
+    def copy(self) -> 'Vector3D':
+        return Vector3D(self.x, self.y, self.z)
+
+    def asArray(self) -> list:
+        return [self.x, self.y, self.z]
+
+    def asPoint(self) -> Point3D:
+        return Point3D(self.x, self.y, self.z)
+
+    @property
+    def length(self) -> float:
+        return math.sqrt(self.x**2 + self.y**2 + self.z**2)
+
+    def scaleBy(self, scale: float) -> bool:
+        self.x, self.y, self.z = self.x*scale, self.y*scale, self.z*scale
+        return True
+
+    def normalize(self) -> bool:
+        length = self.length
+        if length == 0:
+            return False
+        return self.scaleBy(1/length)
+
+    def add(self, vector: 'Vector3D') -> bool:
+        self.x, self.y, self.z = self.x + vector.x, self.y + vector.y, self.z + vector.z
+        return True
+
+    def dotProduct(self, vector: 'Vector3D') -> float:
+        return self.x*vector.x + self.y*vector.y + self.z*vector.z
+
+    def crossProduct(self, vector: 'Vector3D') -> 'Vector3D':
+        return Vector3D(self.y*vector.z - self.z*vector.y,
+                        self.z*vector.x - self.x*vector.z,
+                        self.x*vector.y - self.y*vector.x)
+
+    def isParallelTo(self, vector: 'Vector3D') -> bool:
+        return self.crossProduct(vector).length < 1e-9*max(self.length*vector.length, 1e-12)
+
+
+class Matrix3D(Base):
+    """4x4 transformation matrix, stored by rows."""
+    def __init__(self):
+        self._rows = [[1.0 if i == j else 0.0 for j in range(4)] for i in range(4)]
+
+    @staticmethod
+    def create() -> 'Matrix3D':
+        return Matrix3D()
+
+    def copy(self) -> 'Matrix3D':
+        matrix = Matrix3D()
+        matrix._rows = [row[:] for row in self._rows]
+        return matrix
+
+    @property
+    def translation(self) -> Vector3D:
+        return Vector3D(self._rows[0][3], self._rows[1][3], self._rows[2][3])
+
+    @translation.setter
+    def translation(self, vector: Vector3D):
+        (self._rows[0][3], self._rows[1][3], self._rows[2][3]) = vector.asArray()
+
+    def setToRotation(self, angle: float, axis: Vector3D, origin: Point3D) -> bool:
+        axis = axis.copy()
+        axis.normalize()
+        (x, y, z), c, s = axis.asArray(), math.cos(angle), math.sin(angle)
+        rotation = [[c + x*x*(1 - c), x*y*(1 - c) - z*s, x*z*(1 - c) + y*s],
+                    [y*x*(1 - c) + z*s, c + y*y*(1 - c), y*z*(1 - c) - x*s],
+                    [z*x*(1 - c) - y*s, z*y*(1 - c) + x*s, c + z*z*(1 - c)]]
+        o = origin.asArray()
+        for i in range(3):
+            self._rows[i][:3] = rotation[i]
+            self._rows[i][3] = o[i] - sum(rotation[i][j]*o[j] for j in range(3))
+        self._rows[3] = [0.0, 0.0, 0.0, 1.0]
+        return True
+
+    def _apply(self, values: list, w: float) -> list:
+        return [sum(self._rows[i][j]*values[j] for j in range(3)) + self._rows[i][3]*w for i in range(3)]
+
+
+class Line3D(Base):
+    def __init__(self, startPoint: Point3D, endPoint: Point3D):
+        self.startPoint, self.endPoint = startPoint, endPoint
+
+    @staticmethod
+    def create(startPoint: Point3D, endPoint: Point3D) -> 'Line3D':
+        return Line3D(startPoint, endPoint)
+
+
+class Circle3D(Base):
+    def __init__(self, center: Point3D, normal: Vector3D, radius: float):
+        self.center, self.normal, self.radius = center, normal, radius
+
+    @staticmethod
+    def createByCenter(center: Point3D, normal: Vector3D, radius: float) -> 'Circle3D':
+        return Circle3D(center, normal, radius)
+
+
+class Plane(Base):
+    def __init__(self, origin: Point3D, normal: Vector3D, uDirection: Vector3D = None):
+        self.origin = origin
+        self.normal = normal.copy()
+        self.normal.normalize()
+        if uDirection is None:
+            # Any direction in the plane
+            uDirection = Vector3D(1, 0, 0) if abs(self.normal.x) < 0.9 else Vector3D(0, 1, 0)
+            along_normal = self.normal.copy()
+            along_normal.scaleBy(-uDirection.dotProduct(self.normal))
+            uDirection.add(along_normal)
+        self.uDirection = uDirection.copy()
+        self.uDirection.normalize()
+        self.vDirection = self.normal.crossProduct(self.uDirection)
+
+    @staticmethod
+    def create(origin: Point3D, normal: Vector3D) -> 'Plane':
+        return Plane(origin, normal)
+
+    def isCoPlanarTo(self, plane: 'Plane') -> bool:
+        return (self.normal.isParallelTo(plane.normal)
+                and abs(self.origin.vectorTo(plane.origin).dotProduct(self.normal)) < 1e-9)
+
+    def offset(self, distance: float) -> 'Plane':
+        """Plane moved along its normal (not part of the Fusion 360 API)."""
+        origin = self.origin.copy()
+        normal = self.normal.copy()
+        normal.scaleBy(distance)
+        origin.translateBy(normal)
+        return Plane(origin, self.normal, self.uDirection)
+
+
+class BoundingBox2D(Base):
+    def __init__(self, minPoint: Point2D, maxPoint: Point2D):
+        self.minPoint, self.maxPoint = minPoint, maxPoint
+
+class BoundingBox3D(Base):
+    def __init__(self, minPoint: Point3D, maxPoint: Point3D):
+        self.minPoint, self.maxPoint = minPoint, maxPoint
+
+
+# VALUES -----------------------------------------------------------------------
+
+class ValueInput(Base):
+    def __init__(self, realValue=None, stringValue=''):
+        self.realValue, self.stringValue = realValue, stringValue
+
+    @staticmethod
+    def createByReal(realValue: float) -> 'ValueInput':
+        return ValueInput(realValue=realValue)
+
+    @staticmethod
+    def createByString(stringValue: str) -> 'ValueInput':
+        return ValueInput(stringValue=stringValue)
+
+    @property
+    def valueType(self) -> int:
+        return 0 if self.realValue is not None else 1
+
+
+class ObjectCollection(Collection):
+    @staticmethod
+    def create() -> 'ObjectCollection':
+        return ObjectCollection()
+
+    def add(self, item) -> bool:
+        self._items.append(item)
+        return True
+
+    def clear(self) -> bool:
+        self._items.clear()
+        return True
+
+    def removeByIndex(self, index: int) -> bool:
+        del self._items[index]
+        return True
+
+
+class NamedValues(Base):
+    def __init__(self):
+        self._values = {}
+
+    @staticmethod
+    def create() -> 'NamedValues':
+        return NamedValues()
+
+    def add(self, name: str, value) -> bool:
+        self._values[name] = value
+        return True
+
+
+# EVENTS -----------------------------------------------------------------------
+
+class EventHandler:
+    def __init__(self):
+        pass
+
+    def notify(self, args):
+        pass
+
+class CommandEventHandler(EventHandler): pass
+class CommandCreatedEventHandler(EventHandler): pass
+class ValidateInputsEventHandler(EventHandler): pass
+class InputChangedEventHandler(EventHandler): pass
+class CustomEventHandler(EventHandler): pass
+
+class EventArgs(Base): pass
+class CommandEventArgs(EventArgs): pass
+class ValidateInputsEventArgs(EventArgs): pass
+class InputChangedEventArgs(EventArgs): pass
+
+
+class CustomEventArgs(EventArgs):
+    def __init__(self, additionalInfo: str = ''):
+        self.additionalInfo = additionalInfo
+
+
+class Event(Base):
+    def __init__(self, eventId: str = ''):
+        self.eventId = eventId
+        self._handlers = []
+
+    def add(self, handler) -> bool:
+        self._handlers.append(handler)
+        return True
+
+    def remove(self, handler) -> bool:
+        if handler in self._handlers:
+            self._handlers.remove(handler)
+        return True
+
+
+class CustomEvent(Event): pass
+
+
+# COMMANDS (only what the scripts reference; the command dialog is not simulated) -----
+
+class Command(Base): pass
+class CommandInputs(Collection): pass
+
+
+# USER INTERFACE ---------------------------------------------------------------
+
+class ProgressDialog(Base):
+    def __init__(self, cancelAfter: int = None):
+        self.message = ''
+        self.progressValue = 0
+        self.maximumValue = 0
+        self.isShowing = False
+        self._cancelAfter = cancelAfter
+        self._checks = 0
+
+    @api
+    def show(self, title: str = '', message: str = '', minimumValue: int = 0, maximumValue: int = 0, delay: int = 0) -> bool:
+        self.message, self.maximumValue, self.isShowing = message, maximumValue, True
+        return True
+
+    @api
+    def hide(self) -> bool:
+        self.isShowing = False
+        return True
+
+    @property
+    def wasCancelled(self) -> bool:
+        self._checks += 1
+        return self._cancelAfter is not None and self._checks > self._cancelAfter
+
+
+class Selection(Base):
+    def __init__(self, entity):
+        self.entity = entity
+
+
+class Selections(Collection):
+    def add(self, entity) -> bool:
+        self._items.append(Selection(entity))
+        return True
+
+    def clear(self) -> bool:
+        self._items.clear()
+        return True
+
+
+class UserInterface(Base):
+    def __init__(self):
+        # Messages shown with messageBox, and the answers given by messageBox, inputBox and selectEntity
+        self.messages = []
+        self.messageBoxResult = DialogResults.DialogNo
+        self.inputBoxValue = ''
+        self.selectEntityResults = []
+        self.progressCancelAfter = None
+        self.activeSelections = Selections()
+
+    @api
+    def messageBox(self, text: str, title: str = '', buttons: int = 0, icon: int = 0) -> int:
+        self.messages.append(text)
+        if buttons in (MessageBoxButtonTypes.YesNoButtonType, MessageBoxButtonTypes.YesNoCancelButtonType):
+            return self.messageBoxResult
+        return DialogResults.DialogOK
+
+    @api
+    def inputBox(self, prompt: str, title: str = '', defaultValue: str = '') -> tuple:
+        return (self.inputBoxValue or defaultValue, False)
+
+    @api
+    def selectEntity(self, prompt: str, filter: str) -> Selection:
+        if not self.selectEntityResults:
+            raise RuntimeError('selection cancelled')
+        return Selection(self.selectEntityResults.pop(0))
+
+    @api
+    def createProgressDialog(self) -> ProgressDialog:
+        return ProgressDialog(self.progressCancelAfter)
+
+
+# DATA AND DOCUMENTS -----------------------------------------------------------
+
+class DataFile(Base):
+    def __init__(self, name: str, id: str = None, versionNumber: int = 1, fileExtension: str = 'f3d'):
+        self.name = name
+        self.id = id or token('DataFile')
+        self.versionNumber = versionNumber
+        self.fileExtension = fileExtension
+        self.parentFolder = None
+
+
+class DataFolder(Base):
+    def __init__(self, name: str, id: str = None, files: list = (), folders: list = ()):
+        self.name = name
+        self.id = id or token('DataFolder')
+        self._files = []
+        self._folders = []
+        self.parentFolder = None
+        for file in files:
+            self.addFile(file)
+        for folder in folders:
+            self.addFolder(folder)
+
+    @api_property
+    def dataFiles(self) -> Collection:
+        return Collection(self._files)
+
+    @api_property
+    def dataFolders(self) -> Collection:
+        return Collection(self._folders)
+
+    def addFile(self, file: DataFile) -> DataFile:
+        """Adds a file to the folder (not part of the Fusion 360 API)."""
+        file.parentFolder = self
+        self._files.append(file)
+        return file
+
+    def addFolder(self, folder: 'DataFolder') -> 'DataFolder':
+        """Adds a sub-folder to the folder (not part of the Fusion 360 API)."""
+        folder.parentFolder = self
+        self._folders.append(folder)
+        return folder
+
+    def walk(self):
+        """Files in the folder and all sub-folders (not part of the Fusion 360 API)."""
+        yield from self._files
+        for folder in self._folders:
+            yield from folder.walk()
+
+
+class Data(Base):
+    def __init__(self):
+        self.activeFolder = DataFolder('Project')
+        self._index = {}
+
+    @api
+    def findFileById(self, id: str) -> DataFile:
+        if id not in self._index:
+            self._index = {file.id: file for file in self.activeFolder.walk()}
+        return self._index.get(id)
+
+
+class Product(Base):
+    pass
+
+
+class Products(Collection):
+    def itemByProductType(self, productType: str):
+        for product in self._items:
+            if product.productType == productType:
+                return product
+        return None
+
+
+class Document(Base):
+    def __init__(self, name: str, dataFile: DataFile = None):
+        from . import fusion
+        self.name = name
+        self.dataFile = dataFile
+        self.isSaved = True
+        self._open = True
+        self.design = fusion.Design(self)
+        self.products = Products([self.design])
+
+    @property
+    def isValid(self) -> bool:
+        return self._open
+
+    @api
+    def close(self, saveChanges: bool) -> bool:
+        return Application.get().documents._close(self)
+
+    @api
+    def activate(self) -> bool:
+        return Application.get().documents._activate(self)
+
+
+class Documents(Collection):
+    def __init__(self):
+        super().__init__()
+        self.openCount = 0
+        self.peakCount = 0
+        self.active = None
+
+    @api
+    def open(self, dataFile: DataFile, visible: bool = True) -> Document:
+        if dataFile is None:
+            raise RuntimeError('invalid data file')
+        document = Document(f'{dataFile.name} v{dataFile.versionNumber}', dataFile)
+        self._items.append(document)
+        self.openCount += 1
+        self.peakCount = max(self.peakCount, len(self._items))
+        if visible:
+            self.active = document
+        return document
+
+    @api
+    def add(self, documentType: int = 0) -> Document:
+        document = Document('Untitled')
+        self._items.append(document)
+        self.active = document
+        return document
+
+    def _close(self, document: Document) -> bool:
+        if document in self._items:
+            self._items.remove(document)
+        document._open = False
+        if self.active is document:
+            self.active = self._items[-1] if self._items else None
+        return True
+
+    def _activate(self, document: Document) -> bool:
+        self.active = document
+        return True
+
+
+class ImportOptions(Base):
+    def __init__(self, filename: str):
+        self.filename = filename
+
+
+class ImportManager(Base):
+    def createFusionArchiveImportOptions(self, filename: str) -> ImportOptions:
+        return ImportOptions(filename)
+
+    @api
+    def importToTarget2(self, importOptions: ImportOptions, target) -> ObjectCollection:
+        occurrence = target.occurrences.addNewComponent(Matrix3D.create())
+        occurrence.component.name = os.path.splitext(os.path.basename(importOptions.filename))[0]
+        occurrences = ObjectCollection()
+        occurrences.add(occurrence)
+        return occurrences
+
+
+# APPLICATION ------------------------------------------------------------------
+
+class Application(Base):
+    _instance = None
+
+    def __init__(self):
+        self.userInterface = UserInterface()
+        self.data = Data()
+        self.documents = Documents()
+        self.importManager = ImportManager()
+        self._customEvents = {}
+        self.documents.add()
+
+    @staticmethod
+    def get() -> 'Application':
+        if Application._instance is None:
+            Application._instance = Application()
+        return Application._instance
+
+    @staticmethod
+    def _reset() -> 'Application':
+        """Starts a new application with an empty document (not part of the Fusion 360 API)."""
+        Application._instance = Application()
+        return Application._instance
+
+    @property
+    def activeDocument(self) -> Document:
+        return self.documents.active
+
+    @property
+    def activeProduct(self):
+        return self.documents.active.design if self.documents.active else None
+
+    def registerCustomEvent(self, eventId: str) -> CustomEvent:
+        return self._customEvents.setdefault(eventId, CustomEvent(eventId))
+
+    def unregisterCustomEvent(self, eventId: str) -> bool:
+        return self._customEvents.pop(eventId, None) is not None
+
+    def fireCustomEvent(self, eventId: str, additionalInfo: str = '') -> bool:
+        event = self._customEvents.get(eventId)
+        if event is None:
+            return False
+        fire(event._handlers, CustomEventArgs(additionalInfo))
+        return True
@@ -0,0 +1,857 @@
+# Author - Sindre E. Hinderaker
+# Description - Stand-in for adsk.fusion: designs, components, parameters, sketches, features, bodies and exports.
+#               Bodies are only modelled as planar and cylindrical faces, enough for the scripts to
+#               find faces, analyse them and export files. Boolean operations don't change any geometry.
+
+import re, math
+from . import core
+from ._runtime import Base, Collection, api, api_property, token
+from .core import Point2D, Point3D, Vector3D, Plane
+
+
+class _FusionBase(Base):
+    _namespace = 'fusion'
+
+
+# ENUMERATIONS -----------------------------------------------------------------
+
+class DesignTypes:
+    DirectDesignType = 0
+    ParametricDesignType = 1
+
+class FeatureOperations:
+    JoinFeatureOperation = 0
+    CutFeatureOperation = 1
+    IntersectFeatureOperation = 2
+    NewBodyFeatureOperation = 3
+    NewComponentFeatureOperation = 4
+
+class ExtentDirections:
+    PositiveExtentDirection = 0
+    NegativeExtentDirection = 1
+    SymmetricExtentDirection = 2
+
+class BooleanTypes:
+    DifferenceBooleanType = 0
+    IntersectionBooleanType = 1
+    UnionBooleanType = 2
+
+class TextStyles:
+    TextStyleBold = 1
+    TextStyleItalic = 2
+    TextStyleUnderline = 4
+
+
+# PARAMETERS AND ATTRIBUTES ----------------------------------------------------
+
+class UnitsManager(_FusionBase):
+    """Evaluates simple expressions: numbers with units, parameter names, + - * / and math functions."""
+    _units = {'mm': 0.1, 'cm': 1.0, 'm': 100.0, 'in': 2.54, 'deg': math.pi/180, 'rad': 1.0}
+
+    def __init__(self, design: 'Design'):
+        self._design = design
+
+    def evaluateExpression(self, expression: str, units: str = 'cm') -> float:
+        def number(match):
+            return repr(float(match.group(1))*self._units[match.group(2) or units])
+
+        def name(match):
+            parameter = self._design.userParameters.itemByName(match.group(0))
+            return repr(parameter.value) if parameter else match.group(0)
+
+        text = re.sub(r'(?<![\w.])(\d+(?:\.\d*)?(?:e[+-]?\d+)?)\s*(mm|cm|m|in|deg|rad)?\b', number, str(expression))
+        text = re.sub(r'\b(?!(?:cos|sin|tan|sqrt)\b)[A-Za-z_]\w*\b', name, text)
+        return float(eval(text, {'__builtins__': {}}, {'cos': math.cos, 'sin': math.sin, 'tan': math.tan, 'sqrt': math.sqrt}))
+
+
+class Parameter(_FusionBase):
+    def __init__(self, design: 'Design', name: str, expression: str, unit: str = 'cm', comment: str = ''):
+        self._design = design
+        self.name, self.unit, self.comment = name, unit, comment
+        self._expression = expression
+
+    @property
+    def expression(self) -> str:
+        return self._expression
+
+    @expression.setter
+    def expression(self, value: str):
+        self._expression = value
+        self._design._recompute()
+
+    @property
+    def value(self) -> float:
+        return self._design.unitsManager.evaluateExpression(self._expression, self.unit)
+
+
+class ModelParameter(Parameter): pass
+class UserParameter(Parameter): pass
+
+
+class UserParameters(Collection):
+    def __init__(self, design: 'Design'):
+        super().__init__()
+        self._design = design
+
+    @api
+    def add(self, name: str, value: core.ValueInput, units: str, comment: str) -> UserParameter:
+        expression = value.stringValue if value.realValue is None else f'{value.realValue} {units}'
+        parameter = UserParameter(self._design, name, expression, units, comment)
+        self._items.append(parameter)
+        return parameter
+
+    @api
+    def itemByName(self, name: str) -> UserParameter:
+        for parameter in self._items:
+            if parameter.name == name:
+                return parameter
+        return None
+
+
+class Attribute(_FusionBase):
+    def __init__(self, parent, groupName: str, name: str, value: str):
+        self.parent, self.groupName, self.name, self.value = parent, groupName, name, value
+
+    def deleteMe(self) -> bool:
+        self.parent.attributes._items.remove(self)
+        return True
+
+
+class Attributes(Collection):
+    def __init__(self, parent):
+        super().__init__()
+        self._parent = parent
+
+    @api
+    def add(self, groupName: str, name: str, value: str) -> Attribute:
+        attribute = self.itemByName(groupName, name)
+        if attribute:
+            attribute.value = value
+            return attribute
+        attribute = Attribute(self._parent, groupName, name, value)
+        self._items.append(attribute)
+        return attribute
+
+    def itemByName(self, groupName: str, name: str) -> Attribute:
+        for attribute in self._items:
+            if attribute.groupName == groupName and attribute.name == name:
+                return attribute
+        return None
+
+
+# GEOMETRY ---------------------------------------------------------------------
+
+class SurfaceEvaluator(_FusionBase):
+    def __init__(self, face: 'BRepFace'):
+        self._face = face
+
+    def parametricRange(self) -> core.BoundingBox2D:
+        (u0, u1), (v0, v1) = self._face._u_range, self._face._v_range
+        return core.BoundingBox2D(Point2D(u0, v0), Point2D(u1, v1))
+
+    @api
+    def isParameterOnFace(self, parameter: Point2D) -> bool:
+        return self._face._inside(parameter.x, parameter.y)
+
+    @api
+    def getPointsAtParameters(self, parameters: list) -> tuple:
+        return (True, [self._face._point(parameter.x, parameter.y) for parameter in parameters])
+
+    def getNormalAtParameter(self, parameter: Point2D) -> tuple:
+        return (True, self._face._plane.normal.copy())
+
+    def getNormalAtPoint(self, point: Point3D) -> tuple:
+        return (True, self._face._plane.normal.copy())
+
+    def getCurvature(self, parameter: Point2D) -> tuple:
+        return (True, self._face._plane.uDirection.copy(), 0.0, 0.0)
+
+
+class BRepEdge(_FusionBase):
+    def __init__(self, length: float):
+        self.length = length
+
+
+class BRepFace(_FusionBase):
+    """
+    Planar face on a plane, as a rectangle (u_range, v_range) in the plane, or as a ring between
+    inner_radius and the radius of the range around the plane origin.
+    """
+    def __init__(self, body: 'BRepBody', plane: Plane, u_range: tuple, v_range: tuple, inner_radius: float = None):
+        self.body = body
+        self._plane = plane
+        self._u_range, self._v_range = u_range, v_range
+        self._inner_radius = inner_radius
+        self.entityToken = token('BRepFace')
+        self.attributes = Attributes(self)
+        self.evaluator = SurfaceEvaluator(self)
+        width, height = u_range[1] - u_range[0], v_range[1] - v_range[0]
+        if inner_radius is None:
+            self.area = width*height
+            self.edges = Collection([BRepEdge(width), BRepEdge(height), BRepEdge(width), BRepEdge(height)])
+        else:
+            self.area = math.pi*((width/2)**2 - inner_radius**2)
+            self.edges = Collection([BRepEdge(math.pi*width)] + ([BRepEdge(2*math.pi*inner_radius)] if inner_radius else []))
+
+    def _point(self, u: float, v: float) -> Point3D:
+        point = self._plane.origin.copy()
+        for direction, distance in ((self._plane.uDirection, u), (self._plane.vDirection, v)):
+            offset = direction.copy()
+            offset.scaleBy(distance)
+            point.translateBy(offset)
+        return point
+
+    def _inside(self, u: float, v: float) -> bool:
+        (u0, u1), (v0, v1) = self._u_range, self._v_range
+        if self._inner_radius is None:
+            return u0 <= u <= u1 and v0 <= v <= v1
+        return self._inner_radius**2 <= u*u + v*v <= ((u1 - u0)/2)**2
+
+    @property
+    def geometry(self) -> Plane:
+        return self._plane
+
+    @property
+    def centroid(self) -> Point3D:
+        return self._point(sum(self._u_range)/2, sum(self._v_range)/2)
+
+    @property
+    def pointOnFace(self) -> Point3D:
+        if self._inner_radius is None:
+            return self.centroid
+        return self._point((self._inner_radius + (self._u_range[1] - self._u_range[0])/2)/2, 0)
+
+    @property
+    def boundingBox(self) -> core.BoundingBox3D:
+        corners = [self._point(u, v).asArray() for u in self._u_range for v in self._v_range]
+        return core.BoundingBox3D(Point3D(*[min(values) for values in zip(*corners)]),
+                                  Point3D(*[max(values) for values in zip(*corners)]))
+
+
+class BRepBody(_FusionBase):
+    def __init__(self, name: str = 'Body', faces: list = ()):
+        self.name = name
+        self.parentComponent = None
+        self.entityToken = token('BRepBody')
+        self.attributes = Attributes(self)
+        self._faces = []
+        for face in faces:
+            self._add_face(*face)
+
+    def _add_face(self, plane: Plane, u_range: tuple, v_range: tuple, inner_radius: float = None) -> BRepFace:
+        face = BRepFace(self, plane, u_range, v_range, inner_radius)
+        self._faces.append(face)
+        return face
+
+    @property
+    def faces(self) -> Collection:
+        return Collection(self._faces)
+
+    @staticmethod
+    def box(plane: Plane, width: float, height: float, depth: float, name: str = 'Body') -> 'BRepBody':
+        """Box on a plane, centered at the plane origin (not part of the Fusion 360 API)."""
+        body = BRepBody(name)
+        u, v, n = plane.uDirection, plane.vDirection, plane.normal
+        flipped = n.copy()
+        flipped.scaleBy(-1)
+        body._add_face(Plane(plane.origin, flipped, u), (-width/2, width/2), (-height/2, height/2))
+        body._add_face(plane.offset(depth), (-width/2, width/2), (-height/2, height/2))
+        for direction, half, other, along in ((u, width/2, v, height/2), (v, height/2, u, width/2)):
+            for sign in (1, -1):
+                normal = direction.copy()
+                normal.scaleBy(sign)
+                origin = plane.origin.copy()
+                offset = normal.copy()
+                offset.scaleBy(half)
+                origin.translateBy(offset)
+                half_depth = n.copy()
+                half_depth.scaleBy(depth/2)
+                origin.translateBy(half_depth)
+                body._add_face(Plane(origin, normal, other), (-along, along), (-depth/2, depth/2))
+        return body
+
+    @staticmethod
+    def cylinder(plane: Plane, radius: float, length: float, inner_radius: float = None, name: str = 'Body') -> 'BRepBody':
+        """Cylinder or pipe on a plane, centered at the plane origin (not part of the Fusion 360 API)."""
+        body = BRepBody(name)
+        for offset in (-length/2, length/2):
+            body._add_face(plane.offset(offset), (-radius, radius), (-radius, radius), inner_radius or 0)
+        return body
+
+
+class BRepBodies(Collection):
+    def __init__(self, component: 'Component'):
+        super().__init__()
+        self._component = component
+
+    @api
+    def add(self, body: BRepBody, baseFeature: 'BaseFeature' = None) -> BRepBody:
+        body.parentComponent = self._component
+        body.name = f'Body{len(self._items) + 1}'
+        self._items.append(body)
+        self._component.parentDesign._register(body)
+        return body
+
+    def itemByName(self, name: str) -> BRepBody:
+        for body in self._items:
+            if body.name == name:
+                return body
+        return None
+
+
+class TemporaryBRepManager(_FusionBase):
+    _instance = None
+
+    @staticmethod
+    def get() -> 'TemporaryBRepManager':
+        if TemporaryBRepManager._instance is None:
+            TemporaryBRepManager._instance = TemporaryBRepManager()
+        return TemporaryBRepManager._instance
+
+    @api
+    def createCylinderOrCone(self, pointOne: Point3D, pointOneRadius: float, pointTwo: Point3D, pointTwoRadius: float) -> BRepBody:
+        axis = pointOne.vectorTo(pointTwo)
+        center = pointOne.copy()
+        half = axis.copy()
+        half.scaleBy(0.5)
+        center.translateBy(half)
+        return BRepBody.cylinder(Plane(center, axis), max(pointOneRadius, pointTwoRadius), axis.length)
+
+    @api
+    def booleanOperation(self, targetBody: BRepBody, toolBody: BRepBody, booleanType: int) -> bool:
+        return True
+
+
+# CONSTRUCTION GEOMETRY --------------------------------------------------------
+
+class ConstructionPlane(_FusionBase):
+    def __init__(self, geometry: Plane, name: str = 'Plane'):
+        self.geometry, self.name = geometry, name
+
+
+class ConstructionAxis(_FusionBase):
+    def __init__(self, origin: Point3D, direction: Vector3D, name: str = 'Axis'):
+        self.origin, self.direction, self.name = origin, direction, name
+
+
+class ConstructionPoint(_FusionBase):
+    def __init__(self, geometry: Point3D):
+        self.geometry = geometry
+
+
+class ConstructionPlaneInput(_FusionBase):
+    def __init__(self, component: 'Component'):
+        self._component = component
+        self._plane = None
+
+    def _value(self, value: core.ValueInput, units: str) -> float:
+        if value.realValue is not None:
+            return value.realValue
+        return self._component.parentDesign.unitsManager.evaluateExpression(value.stringValue, units)
+
+    def setByOffset(self, planarEntity, offset: core.ValueInput) -> bool:
+        self._plane = planarEntity.geometry.offset(self._value(offset, 'cm'))
+        return True
+
+    def setByAngle(self, linearEntity: ConstructionAxis, angle: core.ValueInput, planarEntity) -> bool:
+        rotation = core.Matrix3D.create()
+        rotation.setToRotation(self._value(angle, 'deg'), linearEntity.direction, linearEntity.origin)
+        plane = planarEntity.geometry
+        normal = Vector3D(*rotation._apply(plane.normal.asArray(), 0))
+        u_direction = Vector3D(*rotation._apply(plane.uDirection.asArray(), 0))
+        self._plane = Plane(plane.origin.copy(), normal, u_direction)
+        return True
+
+
+class ConstructionPlanes(Collection):
+    def __init__(self, component: 'Component'):
+        super().__init__()
+        self._component = component
+
+    def createInput(self, occurrenceForCreation=None) -> ConstructionPlaneInput:
+        return ConstructionPlaneInput(self._component)
+
+    @api
+    def add(self, input: ConstructionPlaneInput) -> ConstructionPlane:
+        plane = ConstructionPlane(input._plane, f'Plane{len(self._items) + 1}')
+        self._items.append(plane)
+        return plane
+
+
+# SKETCHES ---------------------------------------------------------------------
+
+class SketchPoint(_FusionBase):
+    def __init__(self, geometry: Point3D):
+        self.geometry = geometry
+
+
+class SketchCircle(_FusionBase):
+    def __init__(self, center: SketchPoint, radius: float):
+        self.centerSketchPoint, self.radius = center, radius
+
+
+class SketchLine(_FusionBase):
+    def __init__(self, start: Point3D, end: Point3D):
+        self.startSketchPoint, self.endSketchPoint = SketchPoint(start), SketchPoint(end)
+
+
+class SketchCircles(Collection):
+    def __init__(self, sketch: 'Sketch'):
+        super().__init__()
+        self._sketch = sketch
+
+    @api
+    def addByCenterRadius(self, centerPoint, radius: float) -> SketchCircle:
+        center = centerPoint if isinstance(centerPoint, SketchPoint) else SketchPoint(centerPoint)
+        circle = SketchCircle(center, radius)
+        self._items.append(circle)
+        self._sketch._profiles = None
+        return circle
+
+
+class SketchLines(Collection):
+    def __init__(self, sketch: 'Sketch'):
+        super().__init__()
+        self._sketch = sketch
+
+    @api
+    def addCenterPointRectangle(self, centerPoint: Point3D, cornerPoint: Point3D) -> Collection:
+        (cx, cy), (x, y) = (centerPoint.x, centerPoint.y), (cornerPoint.x, cornerPoint.y)
+        corners = [Point3D(x, y), Point3D(2*cx - x, y), Point3D(2*cx - x, 2*cy - y), Point3D(x, 2*cy - y)]
+        lines = [SketchLine(corners[i], corners[(i + 1) % 4]) for i in range(4)]
+        self._items += lines
+        self._sketch._rectangles.append((cx, cy, abs(x - cx)*2, abs(y - cy)*2))
+        self._sketch._profiles = None
+        return Collection(lines)
+
+
+class SketchCurves(_FusionBase):
+    def __init__(self, sketch: 'Sketch'):
+        self.sketchCircles = SketchCircles(sketch)
+        self.sketchLines = SketchLines(sketch)
+
+
+class SketchTextInput(_FusionBase):
+    def __init__(self, text: str, height: float):
+        self.text, self.height = text, height
+        self.angle = 0.0
+        self.fontName = 'Arial'
+        self.textStyle = 0
+        self._box = None
+
+    def setAsMultiLine(self, cornerPoint: Point3D, diagonalPoint: Point3D, horizontalAlignment: int,
+                       verticalAlignment: int, characterSpacing: float) -> bool:
+        self._box = (cornerPoint, diagonalPoint)
+        return True
+
+
+class SketchText(_FusionBase):
+    def __init__(self, sketch: 'Sketch', input: SketchTextInput):
+        self.parentSketch = sketch
+        self.text, self.height, self.angle = input.text, input.height, input.angle
+
+
+class SketchTexts(Collection):
+    def __init__(self, sketch: 'Sketch'):
+        super().__init__()
+        self._sketch = sketch
+
+    def createInput2(self, formattedText: str, height: float) -> SketchTextInput:
+        return SketchTextInput(formattedText, height)
+
+    @api
+    def add(self, input: SketchTextInput) -> SketchText:
+        text = SketchText(self._sketch, input)
+        self._items.append(text)
+        return text
+
+
+class SketchDimension(_FusionBase):
+    def __init__(self, design: 'Design', name: str, value: float):
+        self.parameter = ModelParameter(design, name, f'{value} cm')
+
+
+class SketchDimensions(Collection):
+    def __init__(self, sketch: 'Sketch'):
+        super().__init__()
+        self._sketch = sketch
+
+    @api
+    def addDiameterDimension(self, entity: SketchCircle, textPoint: Point3D, isDriving: bool = True) -> SketchDimension:
+        design = self._sketch.parentComponent.parentDesign
+        dimension = SketchDimension(design, f'd{design._next_dimension()}', entity.radius*2)
+        self._items.append(dimension)
+        return dimension
+
+
+class Profile(_FusionBase):
+    """Closed region of a sketch: a rectangle, a circle, or the ring between two concentric circles."""
+    def __init__(self, sketch: 'Sketch', kind: str, center: tuple, size: tuple):
+        self.parentSketch, self.kind, self.center, self.size = sketch, kind, center, size
+
+
+class Sketch(_FusionBase):
+    def __init__(self, component: 'Component', plane: Plane, name: str):
+        self.parentComponent, self.name = component, name
+        self._plane = plane
+        self.sketchCurves = SketchCurves(self)
+        self.sketchTexts = SketchTexts(self)
+        self.sketchDimensions = SketchDimensions(self)
+        self._rectangles = []
+        self._profiles = None
+
+    def modelToSketchSpace(self, modelPoint: Point3D) -> Point3D:
+        offset = self._plane.origin.vectorTo(modelPoint)
+        return Point3D(offset.dotProduct(self._plane.uDirection), offset.dotProduct(self._plane.vDirection),
+                       offset.dotProduct(self._plane.normal))
+
+    def sketchToModelSpace(self, sketchPoint: Point3D) -> Point3D:
+        point = self._plane.origin.copy()
+        for direction, distance in ((self._plane.uDirection, sketchPoint.x), (self._plane.vDirection, sketchPoint.y),
+                                    (self._plane.normal, sketchPoint.z)):
+            offset = direction.copy()
+            offset.scaleBy(distance)
+            point.translateBy(offset)
+        return point
+
+    @api_property
+    def profiles(self) -> Collection:
+        if self._profiles is None:
+            profiles = [Profile(self, 'rectangle', (cx, cy), (width, height)) for cx, cy, width, height in self._rectangles]
+            # Concentric circles give rings from the outside in, and the innermost circle
+            circles = {}
+            for circle in self.sketchCurves.sketchCircles:
+                center = circle.centerSketchPoint.geometry
+                circles.setdefault((round(center.x, 9), round(center.y, 9)), []).append(circle.radius)
+            for center, radii in circles.items():
+                radii = sorted(radii, reverse=True)
+                for outer, inner in zip(radii, radii[1:]):
+                    profiles.append(Profile(self, 'ring', center, (outer, inner)))
+                profiles.append(Profile(self, 'circle', center, (radii[-1], 0)))
+            self._profiles = profiles
+        return Collection(self._profiles)
+
+
+class Sketches(Collection):
+    def __init__(self, component: 'Component'):
+        super().__init__()
+        self._component = component
+
+    @api
+    def add(self, planarEntity, occurrenceForCreation=None) -> Sketch:
+        sketch = Sketch(self._component, planarEntity.geometry, f'Sketch{len(self._items) + 1}')
+        self._items.append(sketch)
+        return sketch
+
+
+# FEATURES ---------------------------------------------------------------------
+
+class ToEntityExtentDefinition(_FusionBase):
+    def __init__(self, entity, isChained: bool, offset: core.ValueInput):
+        self.entity, self.isChained, self.offset = entity, isChained, offset
+
+    @staticmethod
+    def create(entity, isChained: bool, offset: core.ValueInput = None) -> 'ToEntityExtentDefinition':
+        return ToEntityExtentDefinition(entity, isChained, offset)
+
+
+class ExtrudeFeatureInput(_FusionBase):
+    def __init__(self, profile, operation: int):
+        self.profile, self.operation = profile, operation
+        self._distance = None
+
+    def setDistanceExtent(self, isSymmetric: bool, distance: core.ValueInput) -> bool:
+        self._distance = distance
+        return True
+
+    def setOneSideExtent(self, extent, direction: int) -> bool:
+        return True
+
+    def setAllExtent(self, direction: int) -> bool:
+        return True
+
+
+class Feature(_FusionBase):
+    def __init__(self, name: str, bodies: list = ()):
+        self.name = name
+        self.bodies = Collection(bodies)
+        self.entityToken = token('Feature')
+
+
+class ExtrudeFeature(Feature):
+    @property
+    def startFaces(self) -> Collection:
+        return Collection([body._faces[0] for body in self.bodies])
+
+    @property
+    def endFaces(self) -> Collection:
+        return Collection([body._faces[1] for body in self.bodies])
+
+
+class ExtrudeFeatures(Collection):
+    def __init__(self, component: 'Component'):
+        super().__init__()
+        self._component = component
+
+    def createInput(self, profile, operation: int) -> ExtrudeFeatureInput:
+        return ExtrudeFeatureInput(profile, operation)
+
+    @api
+    def add(self, input: ExtrudeFeatureInput) -> ExtrudeFeature:
+        bodies = []
+        if input.operation == FeatureOperations.NewBodyFeatureOperation:
+            distance = input._distance
+            if distance is not None and distance.realValue is None:
+                length = self._component.parentDesign.unitsManager.evaluateExpression(distance.stringValue)
+            else:
+                length = distance.realValue if distance is not None else 1.0
+            profiles = input.profile if isinstance(input.profile, Collection) else [input.profile]
+            for profile in profiles:
+                if isinstance(profile, Profile):
+                    bodies.append(self._component.bRepBodies.add(self._body(profile, length)))
+        feature = ExtrudeFeature(f'Extrude{len(self._items) + 1}', bodies)
+        self._items.append(feature)
+        return feature
+
+    @api
+    def addSimple(self, profile, distance: core.ValueInput, operation: int) -> ExtrudeFeature:
+        input = self.createInput(profile, operation)
+        input.setDistanceExtent(False, distance)
+        return self.add(input)
+
+    @staticmethod
+    def _body(profile: Profile, length: float) -> BRepBody:
+        sketch = profile.parentSketch
+        plane = Plane(sketch.sketchToModelSpace(Point3D(*profile.center)), sketch._plane.normal, sketch._plane.uDirection)
+        if profile.kind == 'rectangle':
+            # The start face is on the sketch plane, and the end face is at the extrude distance
+            return BRepBody.box(plane, profile.size[0], profile.size[1], length)
+        return BRepBody.cylinder(plane, profile.size[0], length, profile.size[1])
+
+
+class ShellFeatureInput(_FusionBase):
+    def __init__(self, inputEntities, isTangentChain: bool):
+        self.inputEntities, self.isTangentChain = inputEntities, isTangentChain
+        self.insideThickness = None
+        self.outsideThickness = None
+
+
+class ShellFeatures(Collection):
+    def createInput(self, inputEntities, isTangentChain: bool = True) -> ShellFeatureInput:
+        return ShellFeatureInput(inputEntities, isTangentChain)
+
+    @api
+    def add(self, input: ShellFeatureInput) -> Feature:
+        feature = Feature(f'Shell{len(self._items) + 1}')
+        self._items.append(feature)
+        return feature
+
+
+class BaseFeature(Feature):
+    def startEdit(self) -> bool:
+        return True
+
+    def finishEdit(self) -> bool:
+        return True
+
+
+class BaseFeatures(Collection):
+    @api
+    def add(self) -> BaseFeature:
+        feature = BaseFeature(f'Base Feature{len(self._items) + 1}')
+        self._items.append(feature)
+        return feature
+
+
+class Features(_FusionBase):
+    def __init__(self, component: 'Component'):
+        self.extrudeFeatures = ExtrudeFeatures(component)
+        self.shellFeatures = ShellFeatures()
+        self.baseFeatures = BaseFeatures()
+
+
+# CUSTOM GRAPHICS --------------------------------------------------------------
+
+class CustomGraphicsGroup(_FusionBase):
+    def __init__(self):
+        self._curves = []
+        self._deleted = False
+
+    @property
+    def isValid(self) -> bool:
+        return not self._deleted
+
+    def addCurve(self, curve) -> object:
+        self._curves.append(curve)
+        return curve
+
+    def deleteMe(self) -> bool:
+        self._deleted = True
+        return True
+
+
+class CustomGraphicsGroups(Collection):
+    def add(self) -> CustomGraphicsGroup:
+        group = CustomGraphicsGroup()
+        self._items.append(group)
+        return group
+
+
+# COMPONENTS -------------------------------------------------------------------
+
+class Component(_FusionBase):
+    def __init__(self, design: 'Design', name: str):
+        self.parentDesign = design
+        self.name = name
+        self.entityToken = token('Component')
+        self.attributes = Attributes(self)
+        self.occurrences = Occurrences(self)
+        self.sketches = Sketches(self)
+        self.features = Features(self)
+        self.constructionPlanes = ConstructionPlanes(self)
+        self.bRepBodies = BRepBodies(self)
+        self.customGraphicsGroups = CustomGraphicsGroups()
+
+        origin = Point3D(0, 0, 0)
+        self.originConstructionPoint = ConstructionPoint(origin)
+        self.xYConstructionPlane = ConstructionPlane(Plane(origin, Vector3D(0, 0, 1), Vector3D(1, 0, 0)), 'XY')
+        self.xZConstructionPlane = ConstructionPlane(Plane(origin, Vector3D(0, -1, 0), Vector3D(1, 0, 0)), 'XZ')
+        self.yZConstructionPlane = ConstructionPlane(Plane(origin, Vector3D(1, 0, 0), Vector3D(0, 1, 0)), 'YZ')
+        self.xConstructionAxis = ConstructionAxis(origin, Vector3D(1, 0, 0), 'X')
+        self.yConstructionAxis = ConstructionAxis(origin, Vector3D(0, 1, 0), 'Y')
+        self.zConstructionAxis = ConstructionAxis(origin, Vector3D(0, 0, 1), 'Z')
+
+
+class Occurrence(_FusionBase):
+    def __init__(self, component: Component, transform: core.Matrix3D):
+        self.component = component
+        self._transform = transform.copy()
+        self.entityToken = token('Occurrence')
+
+    @property
+    def name(self) -> str:
+        return f'{self.component.name}:1'
+
+    @property
+    def transform(self) -> core.Matrix3D:
+        return self._transform.copy()
+
+    @transform.setter
+    def transform(self, value: core.Matrix3D):
+        self._transform = value.copy()
+        self.component.parentDesign.snapshots.hasPendingSnapshot = True
+
+
+class Occurrences(Collection):
+    def __init__(self, component: Component):
+        super().__init__()
+        self._component = component
+
+    @api
+    def addNewComponent(self, transform: core.Matrix3D) -> Occurrence:
+        design = self._component.parentDesign
+        component = Component(design, f'Component{len(design._components)}')
+        design._components.append(component)
+        occurrence = Occurrence(component, transform)
+        self._items.append(occurrence)
+        return occurrence
+
+    @api
+    def addExistingComponent(self, component: Component, transform: core.Matrix3D) -> Occurrence:
+        occurrence = Occurrence(component, transform)
+        self._items.append(occurrence)
+        return occurrence
+
+
+# DESIGN AND EXPORT ------------------------------------------------------------
+
+class ExportOptions(_FusionBase):
+    def __init__(self, filename: str, geometry, fileType: str):
+        self.filename, self.geometry, self.fileType = filename, geometry, fileType
+
+
+class ExportManager(_FusionBase):
+    # Size of the exported files [bytes]
+    fileSize = 4096
+
+    def createSTEPExportOptions(self, filename: str, geometry=None) -> ExportOptions:
+        return ExportOptions(filename, geometry, 'step')
+
+    def createIGESExportOptions(self, filename: str, geometry=None) -> ExportOptions:
+        return ExportOptions(filename, geometry, 'iges')
+
+    def createFusionArchiveExportOptions(self, filename: str, geometry=None) -> ExportOptions:
+        return ExportOptions(filename, geometry, 'f3d')
+
+    def createSTLExportOptions(self, geometry, filename: str = '') -> ExportOptions:
+        return ExportOptions(filename, geometry, 'stl')
+
+    @api
+    def execute(self, exportOptions: ExportOptions) -> bool:
+        header = f'{exportOptions.fileType} {getattr(exportOptions.geometry, "name", "")}\n'.encode()
+        with open(exportOptions.filename, 'wb') as f:
+            f.write(header + b'x'*max(0, self.fileSize - len(header)))
+        return True
+
+
+class Snapshots(Collection):
+    def __init__(self):
+        super().__init__()
+        self.hasPendingSnapshot = False
+
+    @api
+    def add(self) -> object:
+        self.hasPendingSnapshot = False
+        self._items.append(token('Snapshot'))
+        return self._items[-1]
+
+
+class Design(core.Product):
+    _namespace = 'fusion'
+    productType = 'DesignProductType'
+
+    def __init__(self, document: core.Document = None):
+        self.parentDocument = document
+        self.designType = DesignTypes.ParametricDesignType
+        self.exportManager = ExportManager()
+        self.unitsManager = UnitsManager(self)
+        self.userParameters = UserParameters(self)
+        self.snapshots = Snapshots()
+        self._components = []
+        self._dimensions = 0
+        self.rootComponent = Component(self, document.name if document else 'Root')
+        self._components.append(self.rootComponent)
+        self._entities = {}
+
+    @property
+    def allComponents(self) -> Collection:
+        return Collection(self._components)
+
+    def _register(self, body: BRepBody):
+        self._entities[body.entityToken] = body
+        for face in body._faces:
+            self._entities[face.entityToken] = face
+
+    def _next_dimension(self) -> int:
+        self._dimensions += 1
+        return self._dimensions
+
+    def _recompute(self):
+        pass
+
+    def findEntityByToken(self, entityToken: str) -> list:
+        entity = self._entities.get(entityToken)
+        return [entity] if entity else []
+
+    @api
+    def findAttributes(self, groupName: str, attributeName: str) -> list:
+        owners = list(self._components) + list(self._entities.values())
+        return [attribute for owner in owners for attribute in owner.attributes
+                if attribute.groupName == groupName and attribute.name == attributeName]
+
+    @api
+    def modifyParameters(self, parameters: list, values: list) -> bool:
+        for parameter, value in zip(parameters, values):
+            parameter._expression = value.stringValue if value.realValue is None else f'{value.realValue} {parameter.unit}'
+        self._recompute()
+        return True
@@ -0,0 +1,229 @@
+# Author - Sindre E. Hinderaker
+# Description - Benchmarks for the scripts, run outside Fusion 360 with the stand-in adsk package in this folder.
+#               Each workload builds a synthetic design or hub folder, imports the script like Fusion 360 does,
+#               and times its run(). Reports throughput and API-call counts, and appends the results to a
+#               history file so they can be compared over time. Run from a terminal, e.g.:
+#               python bench.py                       (all workloads)
+#               python bench.py export --files 500    (one workload, smaller)
+#               python bench.py --latency-scale 0.1   (with simulated Fusion 360 latencies)
+#               python bench.py --profile profiles    (with API profile traces, see Scripts/Extra/ApiProfiler.py)
+
+import os, re, sys, json, time, shutil, random, argparse, datetime, tempfile, subprocess
+
+here = os.path.dirname(os.path.abspath(__file__))
+scripts_path = os.path.join(os.path.dirname(here), 'Scripts')
+sys.path.insert(0, here)
+sys.path.append(scripts_path)
+
+import adsk, adsk.core, adsk.fusion
+from adsk import _runtime
+import tin200_shared as shared
+
+history_name = 'history.jsonl'
+
+
+def load_script(path: str):
+    """Imports a new copy of a script like Fusion 360 does. Returns the module and the import time [s]."""
+    start = time.perf_counter()
+    module = shared.load_script(path)
+    return module, time.perf_counter() - start
+
+
+def new_application(args) -> adsk.core.Application:
+    """New application with an empty design, and the simulated latencies."""
+    _runtime.reset()
+    _runtime.latency.update({name: delay*args.latency_scale for name, delay in _runtime.fusionLatency.items()})
+    shared.reset_handles()
+    return adsk.core.Application._reset()
+
+
+# WORKLOADS --------------------------------------------------------------------
+# Each workload yields (name, number of items, script) for every run to measure, after setting it up.
+
+def export_workload(args, workdir: str):
+    """ExportFolder on a hub folder tree with --files files, exported to STEP, then exported again (incremental)."""
+    app = new_application(args)
+    root = adsk.core.DataFolder('Project')
+    per_folder = 100
+    for group in range((args.files + per_folder*10 - 1) // (per_folder*10)):
+        group_folder = root.addFolder(adsk.core.DataFolder(f'Group {group + 1}'))
+        for folder in range(10):
+            first = (group*10 + folder)*per_folder
+            if first >= args.files:
+                break
+            sub_folder = group_folder.addFolder(adsk.core.DataFolder(f'Folder {folder + 1}'))
+            for i in range(first, min(first + per_folder, args.files)):
+                sub_folder.addFile(adsk.core.DataFile(f'Part {i + 1}'))
+    app.data.activeFolder = root
+
+    for name in ('export', 'export (incremental)'):
+        script, import_time = load_script(os.path.join(scripts_path, 'Lesson 1', 'ExportFolder.py'))
+        script.folder_path = os.path.join(workdir, 'export') + os.sep
+        yield (name, args.files, script, import_time)
+
+
+def valve_workload(args, workdir: str):
+    """FlowValve batch of --valves rows (a fifth of them distinct), built, then again from the library, and as B-rep."""
+    random.seed(1)
+    distinct = [(D, 15, theta) for D in range(30, 80, 5) for theta in range(30, 90, 5)]
+    rows = [distinct[i % max(1, args.valves // 5) % len(distinct)] for i in range(args.valves)]
+    table = os.path.join(workdir, 'valves.csv')
+    with open(table, 'w') as f:
+        f.write('D,d,theta\n' + ''.join(f'{D},{d},{theta}\n' for D, d, theta in rows))
+
+    for name, engine in (('valve', 'timeline'), ('valve (library)', 'timeline'), ('valve (brep)', 'brep')):
+        new_application(args)
+        script, import_time = load_script(os.path.join(scripts_path, 'Lesson 3', 'FlowValve.py'))
+        script.batchTable = table
+        script.buildEngine = engine
+        script.libraryPath = os.path.join(workdir, 'library')
+        yield (name, args.valves, script, import_time)
+
+
+def crate_workload(args, workdir: str):
+    """CrateGenerator batch of --crates crates in 10 sizes."""
+    new_application(args)
+    script, import_time = load_script(os.path.join(scripts_path, 'Extra', 'CrateGenerator.py'))
+    sizes = 10
+    script.crateBatch = [(10 + 5*i, args.crates // sizes + (1 if i < args.crates % sizes else 0)) for i in range(sizes)]
+    yield ('crate', args.crates, script, import_time)
+
+
+def engrave_workload(args, workdir: str):
+    """Engrave batch of serial numbers on --faces faces (selected before running), then again with cached analyses."""
+    app = new_application(args)
+    root_comp = app.activeProduct.rootComponent
+    faces = []
+    for i in range((args.faces + 5) // 6):
+        plane = adsk.core.Plane(adsk.core.Point3D(i*20, 0, 0), adsk.core.Vector3D(0, 0, 1))
+        body = root_comp.bRepBodies.add(adsk.fusion.BRepBody.box(plane, 10, 6, 4))
+        faces += list(body.faces)
+
+    for name in ('engrave', 'engrave (cached analysis)'):
+        app.userInterface.activeSelections.clear()
+        for face in faces[:args.faces]:
+            app.userInterface.activeSelections.add(face)
+        script, import_time = load_script(os.path.join(scripts_path, 'Lesson 2', 'Engrave.py'))
+        script.batchMode = True
+        yield (name, args.faces, script, import_time)
+
+
+workloads = {
+    'export': export_workload,
+    'valve': valve_workload,
+    'crate': crate_workload,
+    'engrave': engrave_workload,
+}
+
+
+# MEASUREMENT ------------------------------------------------------------------
+
+def measure(name: str, items: int, script, import_time: float, profile_path: str = None) -> dict:
+    """Times the run() of a script, and counts the API calls. Writes a profile trace to profile_path (if given)."""
+    ui = adsk.core.Application.get().userInterface
+    ui.messages.clear()
+    _runtime.calls.clear()
+
+    profiler = None
+    if profile_path:
+        (api_profiler, _) = load_script(os.path.join(scripts_path, 'Extra', 'ApiProfiler.py'))
+        profiler = api_profiler.ApiProfiler()
+        profiler.install()
+
+    start = time.perf_counter()
+    try:
+        script.run(None)
+    finally:
+        run_time = time.perf_counter() - start
+        if profiler:
+            profiler.uninstall()
+            profiler.save(os.path.join(profile_path, re.sub(r'\W+', '_', name).strip('_')), 'trace', script.__file__, run_time)
+
+    api_calls = sum(_runtime.calls.values())
+    failures = [message for message in ui.messages if message.startswith('Failed')]
+    return {
+        'workload': name,
+        'items': items,
+        'import_s': round(import_time, 4),
+        'run_s': round(run_time, 4),
+        'items_per_s': round(items / run_time, 1) if run_time else None,
+        'api_calls': api_calls,
+        'calls_per_item': round(api_calls / items, 2) if items else None,
+        'top_calls': _runtime.calls.most_common(5),
+        'failed': failures[0].splitlines()[-1] if failures else None,
+    }
+
+
+def git_revision() -> str:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, capture_output=True, text=True).stdout.strip()
+    except OSError:
+        return ''
+
+
+def previous_results(path: str) -> dict:
+    """Results of the latest earlier benchmark of each workload, from the history file."""
+    results = {}
+    if os.path.exists(path):
+        with open(path) as f:
+            for line in f:
+                entry = json.loads(line)
+                for result in entry['results']:
+                    results[result['workload']] = result
+    return results
+
+
+def report(results: list, previous: dict):
+    print(f'{"workload":<26}{"items":>7}{"import s":>10}{"run s":>9}{"items/s":>10}{"change":>8}{"API calls":>11}{"calls/item":>12}')
+    for result in results:
+        change = ''
+        earlier = previous.get(result['workload'])
+        if earlier and earlier.get('items_per_s') and result['items_per_s'] and earlier['items'] == result['items']:
+            change = f'{(result["items_per_s"] / earlier["items_per_s"] - 1)*100:+.0f}%'
+        print(f'{result["workload"]:<26}{result["items"]:>7}{result["import_s"]:>10.3f}{result["run_s"]:>9.2f}'
+              f'{result["items_per_s"] or 0:>10.1f}{change:>8}{result["api_calls"]:>11}{result["calls_per_item"] or 0:>12.1f}')
+        print('    ' + ', '.join(f'{name} {count}' for name, count in result['top_calls']))
+        if result['failed']:
+            print(f'    FAILED: {result["failed"]}')
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the Fusion 360 scripts with the stand-in adsk package.')
+    parser.add_argument('workloads', nargs='*', help=f'workloads to run: {", ".join(workloads)} (default: all)')
+    parser.add_argument('--files', type=int, default=5000, help='files in the hub folder tree (export)')
+    parser.add_argument('--valves', type=int, default=500, help='rows in the flow-valve batch table (valve)')
+    parser.add_argument('--crates', type=int, default=500, help='crates in the crate batch (crate)')
+    parser.add_argument('--faces', type=int, default=200, help='faces to engrave (engrave)')
+    parser.add_argument('--latency-scale', type=float, default=0.0, help='scale of the simulated Fusion 360 API latencies')
+    parser.add_argument('--history', default=os.path.join(here, history_name), help='history file of the results')
+    parser.add_argument('--no-history', action='store_true', help="don't append the results to the history file")
+    parser.add_argument('--profile', metavar='DIR', help='write an API profile trace of each workload to DIR (slower)')
+    args = parser.parse_args()
+    if args.profile:
+        os.makedirs(args.profile, exist_ok=True)
+        args.no_history = True  # profiled runs are slower, and are not compared
+    for workload in args.workloads:
+        if workload not in workloads:
+            parser.error(f'unknown workload "{workload}"')
+
+    previous = previous_results(args.history)
+    results = []
+    workdir = tempfile.mkdtemp(prefix='bench_')
+    try:
+        for workload in args.workloads or list(workloads):
+            os.makedirs(os.path.join(workdir, workload))
+            for name, items, script, import_time in workloads[workload](args, os.path.join(workdir, workload)):
+                results.append(measure(name, items, script, import_time, args.profile))
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+    report(results, previous)
+    if not args.no_history:
+        entry = {'date': datetime.datetime.now().isoformat(timespec='seconds'), 'revision': git_revision(),
+                 'latency_scale': args.latency_scale, 'results': results}
+        with open(args.history, 'a') as f:
+            f.write(json.dumps(entry) + '\n')
+
+    # Fail (e.g. in CI) when a script reported an error
+    if any(result['failed'] for result in results):
+        sys.exit(1)
@@ -0,0 +1,221 @@
+# Author - Sindre E. Hinderaker
+# Description - Runs another script with the Fusion 360 API profiled, without changing the script.
+#               Every method and property of the adsk.core and adsk.fusion classes is wrapped while the
+#               script runs, and the count, total and percentile time of each API call is written to a
+#               JSON-file, or to a trace-file for chrome://tracing or https://ui.perfetto.dev. Documents
+#               (open to close) and feature/export calls are also recorded as spans in the trace.
+#               Nothing is wrapped unless the profiler is installed, so scripts run at full speed otherwise.
+#               Scripts that keep running after run() returns (command dialogs, which call adsk.autoTerminate(False))
+#               are profiled until they terminate, or until this script is stopped.
+
+import os, re, sys, json, time, inspect, threading
+import adsk.core, adsk.fusion
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if scripts_path not in sys.path:
+    sys.path.append(scripts_path)  # for the shared helpers
+import tin200_shared as shared
+
+# Script to profile
+targetScript = os.path.join(scripts_path, 'Lesson 1', 'ExportFolder.py')
+
+# Output: 'json' (statistics per API method) or 'trace' (Chrome trace with spans, and the statistics)
+profileFormat = 'json'
+profilePath = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profile')  # without file extension
+
+# API calls recorded as spans in the trace (regular expression on 'Class.method')
+spanMethods = r'^(Documents\.open|Document\.close|\w*Features\.add\w*|ExportManager\.execute|ImportManager\.importToTarget2?|Sketches\.add|Occurrences\.add\w*)$'
+
+# Modules with the API classes to profile
+profiledModules = [adsk.core, adsk.fusion]
+
+# Profile of a script that keeps running after run() returns, saved when the script terminates
+_session = {}
+
+
+class ApiProfiler():
+    """Wraps the API classes of the profiled modules, and records the time of every call."""
+    def __init__(self, modules: list = None):
+        self.modules = modules or profiledModules
+        self.stats = {}        # 'Class.method' -> list of call times [s]
+        self.spans = []        # trace events
+        self.documents = {}    # id(document) -> (name, open time)
+        self._originals = []   # (class, attribute name, original attribute)
+        self._span_pattern = re.compile(spanMethods)
+        self._start = None
+
+    # Installation ----------------------------------------------------------
+    def install(self):
+        """Wraps the methods and properties of every API class."""
+        self._start = time.perf_counter()
+        for module in self.modules:
+            for class_name, cls in inspect.getmembers(module, inspect.isclass):
+                # Skip event handlers (implemented by the scripts) and classes from other modules
+                if class_name.endswith('EventHandler') or cls.__module__ != module.__name__:
+                    continue
+                for name, attribute in list(vars(cls).items()):
+                    if name.startswith('_'):
+                        continue
+                    wrapped = self._wrap_attribute(f'{class_name}.{name}', attribute)
+                    if wrapped is not None:
+                        self._originals.append((cls, name, attribute))
+                        setattr(cls, name, wrapped)
+
+    def uninstall(self):
+        """Restores the original methods and properties."""
+        for cls, name, attribute in reversed(self._originals):
+            setattr(cls, name, attribute)
+        self._originals = []
+
+    def _wrap_attribute(self, name: str, attribute):
+        if isinstance(attribute, staticmethod):
+            return staticmethod(self._wrap(name, attribute.__func__))
+        if isinstance(attribute, classmethod):
+            return classmethod(self._wrap(name, attribute.__func__))
+        if isinstance(attribute, property):
+            if attribute.fget is None:
+                return None
+            return property(self._wrap(name, attribute.fget), attribute.fset, attribute.fdel, attribute.__doc__)
+        if inspect.isfunction(attribute):
+            return self._wrap(name, attribute)
+        return None
+
+    def _wrap(self, name: str, function):
+        times = self.stats.setdefault(name, [])
+        span = bool(self._span_pattern.match(name))
+        profiler = self
+
+        def wrapper(*args, **kwargs):
+            result = None
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+                return result
+            finally:
+                end = time.perf_counter()
+                times.append(end - start)
+                if span:
+                    profiler._record_span(name, start, end, args, result)
+        wrapper.__name__ = getattr(function, '__name__', name)
+        wrapper.__doc__ = getattr(function, '__doc__', None)
+        return wrapper
+
+    # Recording -------------------------------------------------------------
+    def _us(self, seconds: float) -> float:
+        return round((seconds - self._start)*1e6, 1)
+
+    def _record_span(self, name: str, start: float, end: float, args: tuple, result):
+        self.spans.append({'name': name, 'cat': 'api', 'ph': 'X', 'ts': self._us(start), 'dur': round((end - start)*1e6, 1),
+                           'pid': os.getpid(), 'tid': threading.get_ident()})
+        # Document spans, from open to close
+        if name == 'Documents.open' and result is not None:
+            self.documents[id(result)] = (getattr(result, 'name', ''), end)
+        elif name == 'Document.close' and args and id(args[0]) in self.documents:
+            (document, opened) = self.documents.pop(id(args[0]))
+            self.spans.append({'name': document, 'cat': 'document', 'ph': 'X', 'ts': self._us(opened),
+                               'dur': round((start - opened)*1e6, 1), 'pid': os.getpid(), 'tid': 0})
+
+    # Results ---------------------------------------------------------------
+    def summary(self) -> dict:
+        """Count, total and percentile times [ms] of each called API method, slowest total first."""
+        methods = {}
+        for name, times in self.stats.items():
+            if not times:
+                continue
+            ordered = sorted(times)
+            percentile = lambda p: round(ordered[min(len(ordered) - 1, int(p/100*len(ordered)))]*1000, 3)
+            methods[name] = {'count': len(times),
+                             'total_ms': round(sum(times)*1000, 3),
+                             'mean_ms': round(sum(times)/len(times)*1000, 3),
+                             'p50_ms': percentile(50),
+                             'p90_ms': percentile(90),
+                             'p99_ms': percentile(99),
+                             'max_ms': round(ordered[-1]*1000, 3)}
+        return dict(sorted(methods.items(), key=lambda item: item[1]['total_ms'], reverse=True))
+
+    def save(self, path: str, format: str = 'json', script: str = '', seconds: float = None) -> str:
+        """Writes the statistics (json), or the spans and statistics (trace). Returns the path of the file."""
+        summary = self.summary()
+        if format == 'trace':
+            path += '.trace.json'
+            content = {'traceEvents': self.spans, 'displayTimeUnit': 'ms',
+                       'otherData': {'script': script, 'seconds': seconds, 'methods': summary}}
+        else:
+            path += '.json'
+            content = {'script': script, 'seconds': seconds, 'methods': summary}
+        with open(path, 'w') as f:
+            json.dump(content, f, indent=1)
+        return path
+
+    def report(self, count: int = 8) -> str:
+        lines = [f'{name}: {stats["count"]} calls, {stats["total_ms"]:.0f} ms (p90 {stats["p90_ms"]:.1f} ms)'
+                 for name, stats in list(self.summary().items())[:count]]
+        return '\n'.join(lines)
+
+
+def finish_profile():
+    """Uninstalls the profiler, and saves and reports the profile of the script (once)."""
+    if not _session:
+        return
+    session = dict(_session)
+    _session.clear()
+    if 'terminate' in session:
+        adsk.terminate = session['terminate']
+    profiler = session['profiler']
+    profiler.uninstall()
+    seconds = round(time.perf_counter() - session['start'], 3)
+
+    path = profiler.save(profilePath, profileFormat, targetScript, seconds)
+    shared.ui().messageBox(f'Profiled {os.path.basename(targetScript)} ({seconds} s)\n\n{profiler.report()}\n\nSaved to "{path}"')
+
+
+def run(context):
+    try:
+        # Profile importing and running the script
+        profiler = ApiProfiler()
+        _session.update(profiler=profiler, script=None, start=time.perf_counter(), keep_running=False)
+        profiler.install()
+
+        # Scripts that wait for events call adsk.autoTerminate(False), and keep running after run() returns
+        auto_terminate = adsk.autoTerminate
+        def autoTerminate(value: bool):
+            _session['keep_running'] = not value
+            return auto_terminate(value)
+        adsk.autoTerminate = autoTerminate
+        try:
+            _session['script'] = shared.load_script(targetScript, 'profiled_')
+            _session['script'].run(context)
+        finally:
+            adsk.autoTerminate = auto_terminate
+
+        if not _session['keep_running']:
+            finish_profile()
+            return
+
+        # Keep profiling the event handlers (e.g. the execute handler of a command dialog) until the script
+        # terminates itself. Stopping this script also saves the profile (see stop)
+        terminate = adsk.terminate
+        def profiled_terminate():
+            finish_profile()
+            terminate()
+        _session['terminate'] = terminate
+        adsk.terminate = profiled_terminate
+
+    except:
+        shared.report_error()
+        if _session:
+            if 'terminate' in _session:
+                adsk.terminate = _session['terminate']
+            _session['profiler'].uninstall()
+            _session.clear()
+
+
+def stop(context):
+    try:
+        # Stop the profiled script, and save its profile (unless it has terminated itself)
+        script = _session.get('script')
+        if script is not None and hasattr(script, 'stop'):
+            script.stop(context)
+        finish_profile()
+    except:
+        shared.report_error()
@@ -1,58 +1,146 @@
 # Author - Sindre E. Hinderaker
 # Description - Generates a cubed crate based on user-input.
+#               Entering several sizes and counts (e.g. "10x4, 20x2") generates a batch of crates, where each distinct
+#               size is built once in its own component and the copies are placed on a grid.
 
-from email.policy import default
-from logging import root
-import adsk.core, adsk.fusion, adsk.cam, traceback
+import os, sys, math
+import adsk.core, adsk.fusion
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if scripts_path not in sys.path:
+    sys.path.append(scripts_path)  # for the shared helpers
+import tin200_shared as shared
 
 cubeSize = None
 
+# Batch of crates as (size [cm], count), e.g. [(10, 4), (20, 2)]. If empty, the sizes are asked for when run.
+crateBatch = []
+crateSpacing = 5    # [cm] gap between the crates on the grid
+
 def run(context):
-    ui = None
     try:
-        # Get Fusino 360 application, user interface, and active design-document
-        app = adsk.core.Application.get()
-        ui  = app.userInterface
-        design = adsk.fusion.Design.cast(app.activeProduct)
-
-        (returnValue, cancelled) = ui.inputBox('Specify crate size', 'Crate Generator', '10')
-
-        if not cancelled:
-                # Get specified value from user input
-                cubeSize = adsk.core.ValueInput.createByString(f'{returnValue} cm')
-                
-                # Get root component of the design
-                root_comp = design.rootComponent
-
-                # Create sketch
-                sketches = root_comp.sketches
-                crate_sketch = sketches.add(root_comp.xZConstructionPlane)
-
-                # Add main/centre rectangle lines
-                origin = adsk.core.Point3D.create(0, 0, 0)
-                crate_corner = adsk.core.Point3D.create(float(returnValue)/2, float(returnValue)/2, 0)
-                crate_lines = crate_sketch.sketchCurves.sketchLines.addCenterPointRectangle(origin, crate_corner)
-
-                # Get the crate profile and create extrude feature
-                crate_profile = crate_sketch.profiles.item(0)
-                extrudecrate = root_comp.features.extrudeFeatures.addSimple(crate_profile, cubeSize, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
-                # extInput = root_comp.features.extrudeFeatures.createInput(crate_profile,  adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
-                # extInput.setDistanceExtent(False, cubeSize)
-                # root_comp.features.extrudeFeatures.add(extInput)
-
-                # Create object collection with the desired face entity
-                crate_face_entity = adsk.core.ObjectCollection.create()
-                crate_face_entity.add(extrudecrate.endFaces.item(0)) # end face of the extruded body/crate
-
-                # Shell body in the object collection
-                shellFeats = root_comp.features.shellFeatures
-                shellFeatureInput = shellFeats.createInput(crate_face_entity)
-                shellFeatureInput.insideThickness = adsk.core.ValueInput.createByReal(float(returnValue)/10)
-                shellFeats.add(shellFeatureInput)
-
-        if cancelled:
-            ui.messagecrate('crate generation was canceled')
+        # Get Fusino 360 user interface, and active design-document
+        ui = shared.ui()
+        design = shared.design()
+
+        crates = crateBatch
+        if not crates:
+            (returnValue, cancelled) = ui.inputBox('Specify crate size, or sizes and counts (e.g. 10x4, 20x2)', 'Crate Generator', '10')
+
+            if cancelled:
+                ui.messageBox('Crate generation was canceled')
+                return
+
+            crates = parse_crates(returnValue)
+
+        # Get root component of the design
+        root_comp = design.rootComponent
+
+        # A single crate is generated directly in the root component
+        if len(crates) == 1 and crates[0][1] == 1:
+            create_crate(root_comp, crates[0][0])
+            return
+
+        # Batch of crates, failures are reported per size
+        (created, failures) = create_batch(root_comp, crates)
+        message = f'Generated {created} crates'
+        if failures:
+            message += ', failed:\n' + '\n'.join(failures)
+        ui.messageBox(message)
 
     except:
-        if ui:
-            ui.messagecrate('Failed:\n{}'.format(traceback.format_exc()))
+        shared.report_error()
+
+
+def parse_crates(text: str) -> list:
+    """(size, count) for each 'size' or 'size x count', separated by commas."""
+    crates = []
+    for item in text.split(','):
+        (size, _, count) = item.lower().partition('x')
+        crates.append((float(size), int(count) if count.strip() else 1))
+    return crates
+
+
+def create_crate(comp: adsk.fusion.Component, size: float):
+    """Creates a crate in the component, with outer size [cm]."""
+    cubeSize = adsk.core.ValueInput.createByReal(size)
+
+    # Create sketch
+    sketches = comp.sketches
+    crate_sketch = sketches.add(comp.xZConstructionPlane)
+
+    # Add main/centre rectangle lines
+    origin = adsk.core.Point3D.create(0, 0, 0)
+    crate_corner = adsk.core.Point3D.create(size/2, size/2, 0)
+    crate_lines = crate_sketch.sketchCurves.sketchLines.addCenterPointRectangle(origin, crate_corner)
+
+    # Get the crate profile and create extrude feature
+    crate_profile = crate_sketch.profiles.item(0)
+    extrudecrate = comp.features.extrudeFeatures.addSimple(crate_profile, cubeSize, adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+    # extInput = comp.features.extrudeFeatures.createInput(crate_profile,  adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
+    # extInput.setDistanceExtent(False, cubeSize)
+    # comp.features.extrudeFeatures.add(extInput)
+
+    # Create object collection with the desired face entity
+    crate_face_entity = adsk.core.ObjectCollection.create()
+    crate_face_entity.add(extrudecrate.endFaces.item(0)) # end face of the extruded body/crate
+
+    # Shell body in the object collection
+    shellFeats = comp.features.shellFeatures
+    shellFeatureInput = shellFeats.createInput(crate_face_entity)
+    shellFeatureInput.insideThickness = adsk.core.ValueInput.createByReal(size/10)
+    shellFeats.add(shellFeatureInput)
+
+
+def create_batch(root_comp: adsk.fusion.Component, crates: list) -> tuple:
+    """
+    Builds each distinct crate size once in a new component, and places the copies as occurrences of that
+    component on a grid in the XZ plane. Returns the number of crates created, and a message for each failed size.
+    """
+    steps = create_batch_steps(root_comp, crates)
+    while True:
+        try:
+            next(steps)
+        except StopIteration as done:
+            return done.value
+
+
+def create_batch_steps(root_comp: adsk.fusion.Component, crates: list):
+    """
+    Creates the batch like create_batch, as a generator that yields after each crate, so the batch can
+    also be run in slices (see JobScheduler.py). Returns (created, failures) like create_batch.
+    """
+    # Total count for each distinct size
+    counts = {}
+    for size, count in crates:
+        counts[size] = counts.get(size, 0) + count
+
+    # Square grid, with room for the largest crate in each cell
+    columns = math.ceil(math.sqrt(sum(counts.values())))
+    pitch = max(counts) + crateSpacing
+    slot = 0
+    created = 0
+    failures = []
+
+    for size, count in counts.items():
+        try:
+            component = None
+            for copy in range(count):
+                transform = adsk.core.Matrix3D.create()
+                transform.translation = adsk.core.Vector3D.create((slot % columns)*pitch, 0, (slot // columns)*pitch)
+
+                if component is None:
+                    # Build the crate once, in its own component
+                    occurrence = root_comp.occurrences.addNewComponent(transform)
+                    component = occurrence.component
+                    component.name = f'Crate {size:g} cm'
+                    create_crate(component, size)
+                else:
+                    root_comp.occurrences.addExistingComponent(component, transform)
+                slot += 1
+                created += 1
+                yield
+        except Exception as error:  # not GeneratorExit, when the steps are closed
+            failures.append(f'{size:g} cm ({count - copy} of {count}): {type(error).__name__}: {error}')
+
+    return (created, failures)
@@ -0,0 +1,315 @@
+# Author - Sindre E. Hinderaker
+# Description - Runs export, valve, crate and engrave jobs from a job file, unattended, without blocking Fusion 360.
+#               A background thread reads new jobs from the job file, and queues them by priority. The jobs run on
+#               the main thread (the API may only be used there), in short slices fired as a custom event, so
+#               Fusion 360 stays responsive between the slices. Each job can have a timeout, export jobs can have
+#               a number of retries, and the result of every attempt is appended to a results log. Stop the script
+#               to stop the scheduler.
+#
+#               Job file (JSON), a list of jobs, e.g.:
+#               [{"id": "nightly-export", "kind": "export", "priority": 1, "timeout": 7200, "retries": 2,
+#                 "settings": {"folder_path": "D:/Exports/", "file_types": [".step", ".f3d"]}},
+#                {"id": "valves", "kind": "valve", "settings": {"batchTable": "D:/valves.csv"}}]
+#               "settings" sets the configuration variables at the top of the script, for that job only.
+#               Jobs are identified by their id, so jobs can be added to the file while the scheduler runs.
+
+import os, sys, json, time, heapq, types, datetime, threading, traceback
+import adsk.core, adsk.fusion
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if scripts_path not in sys.path:
+    sys.path.append(scripts_path)  # for the shared helpers
+import tin200_shared as shared
+
+# Job file, and the log the results are appended to (one JSON line per attempt)
+jobFile = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'jobs.json')
+resultsLog = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'job_results.jsonl')
+
+# Time each slice may use the main thread, before Fusion 360 gets it back
+sliceTime = 0.2         # [s]
+
+# How often the job file is checked for new jobs
+pollInterval = 5        # [s]
+
+# Defaults for jobs without "priority" (lower runs first), "timeout" and "retries"
+defaultPriority = 10
+defaultTimeout = 3600   # [s] checked between the steps of a job, so a single long step is not interrupted
+defaultRetries = 1
+
+# Job kinds that are retried. A retry runs the job again from the start, so only jobs that resume where the
+# failed attempt stopped are retried (other jobs would e.g. create the same flow-valves in the design again).
+retriedKinds = {'export'}
+
+# Stop the scheduler when all jobs are done (otherwise it waits for new jobs until the script is stopped)
+stopWhenIdle = False
+
+# Record the message boxes of the jobs in the results log, instead of showing them (questions are answered No)
+quietMessages = True
+
+eventId = 'JobSchedulerEvent'
+
+# Global set of event _handlers to keep them referenced for the duration of the script
+_handlers = []
+
+# Scheduler state, shared between the feeder thread and the main thread
+_state = {'queue': [], 'seen': set(), 'job': None, 'scheduled': False, 'sequence': 0}
+_lock = threading.Lock()
+_log_lock = threading.Lock()
+_stop = threading.Event()
+
+
+# JOB KINDS --------------------------------------------------------------------
+# Each job kind loads its script, and returns a generator with the steps of the job (see the *_steps functions
+# of the scripts). The value returned by the generator is logged as the result of the job.
+
+def export_job(script: types.ModuleType):
+    error = script.settings_error()
+    if error:
+        raise ValueError(error)
+    # Retries continue an interrupted export, instead of asking (unless the job sets resume_interrupted)
+    if script.resume_interrupted is None:
+        script.resume_interrupted = True
+    return script.export_steps(shared.app().data.activeFolder)
+
+
+def valve_job(script: types.ModuleType):
+    if not script.batchTable:
+        raise ValueError('valve jobs require the setting "batchTable"')
+    return script.createBatchSteps(script.batchTable)
+
+
+def crate_job(script: types.ModuleType):
+    if not script.crateBatch:
+        raise ValueError('crate jobs require the setting "crateBatch"')
+    crates = [tuple(crate) for crate in script.crateBatch]
+    return script.create_batch_steps(shared.design().rootComponent, crates)
+
+
+def engrave_job(script: types.ModuleType):
+    design = shared.design()
+    # Jobs run unattended, so the faces are not selected interactively
+    faces = script.get_batch_faces(design, shared.ui(), interactive=False)
+    if not faces:
+        raise ValueError('no faces to engrave (set "faceTokens", or select the faces before starting the scheduler)')
+    return script.engrave_steps(design.rootComponent, faces, script.batch_texts(faces))
+
+
+job_kinds = {
+    'export': ('Lesson 1/ExportFolder.py', export_job),
+    'valve': ('Lesson 3/FlowValve.py', valve_job),
+    'crate': ('Extra/CrateGenerator.py', crate_job),
+    'engrave': ('Lesson 2/Engrave.py', engrave_job),
+}
+
+
+def start_job(job: dict):
+    """Loads a new copy of the script of the job, applies the settings, and returns the steps of the job."""
+    (script_path, start) = job_kinds[job['kind']]
+    script = shared.load_script(os.path.join(scripts_path, script_path), 'jobs_')
+    for name, value in job.get('settings', {}).items():
+        if name.startswith('_') or not hasattr(script, name):
+            raise ValueError(f'unknown setting "{name}" for {job["kind"]} jobs')
+        setattr(script, name, value)
+    return start(script)
+
+
+# JOB QUEUE --------------------------------------------------------------------
+
+def read_jobs(path: str) -> list:
+    """Reads the jobs from the job file. Jobs without an id get one from their position in the file."""
+    with open(path) as f:
+        jobs = json.load(f)
+    for index, job in enumerate(jobs):
+        job.setdefault('id', f'job-{index + 1}')
+    return jobs
+
+
+def queue_job(job: dict):
+    """Queues a job by priority (then in order of arrival). Call with _lock held."""
+    _state['sequence'] += 1
+    heapq.heappush(_state['queue'], (job.get('priority', defaultPriority), _state['sequence'], job))
+
+
+def feed_jobs():
+    """Background thread: queues new jobs from the job file, and fires the event that runs them."""
+    modified = None
+    while not _stop.is_set():
+        try:
+            if os.path.exists(jobFile) and os.path.getmtime(jobFile) != modified:
+                modified = os.path.getmtime(jobFile)
+                jobs = read_jobs(jobFile)
+                with _lock:
+                    for job in jobs:
+                        if job['id'] in _state['seen']:
+                            continue
+                        _state['seen'].add(job['id'])
+                        if job.get('kind') not in job_kinds:
+                            log_result(job, 'failed', 1, error=f'unknown job kind "{job.get("kind")}"')
+                            continue
+                        queue_job(job)
+            schedule_slice()
+        except:
+            log_result({'id': None, 'kind': None}, 'failed', 0, error=traceback.format_exc())
+        _stop.wait(pollInterval)
+
+
+def schedule_slice():
+    """Fires the event for the next slice, unless one is already scheduled or there is nothing to do."""
+    with _lock:
+        if _state['scheduled'] or _stop.is_set() or not (_state['job'] or _state['queue']):
+            return
+        _state['scheduled'] = True
+    shared.app().fireCustomEvent(eventId)
+
+
+def log_result(job: dict, status: str, attempt: int, **details):
+    """Appends the result of an attempt to the results log."""
+    entry = {'time': datetime.datetime.now().isoformat(timespec='seconds'), 'id': job.get('id'), 'kind': job.get('kind'),
+             'status': status, 'attempt': attempt}
+    entry.update(details)
+    with _log_lock:
+        with open(resultsLog, 'a') as f:
+            f.write(json.dumps(entry, default=str) + '\n')
+
+
+# JOB SLICES -------------------------------------------------------------------
+
+class RunningJob():
+    """A job attempt in progress: the steps of the job, and what it has used so far."""
+    def __init__(self, job: dict, attempt: int):
+        self.job = job
+        self.attempt = attempt
+        self.steps = None
+        self.started = time.perf_counter()
+        self.timeout = job.get('timeout', defaultTimeout)
+        self.slices = 0
+        self.step_count = 0
+        self.messages = []
+
+    def finish(self, status: str, result=None, error: str = None):
+        log_result(self.job, status, self.attempt, seconds=round(time.perf_counter() - self.started, 3),
+                   slices=self.slices, steps=self.step_count, result=result, error=error, messages=self.messages)
+
+
+def run_slice():
+    """Runs the current job (or the next queued job) until the slice time is used. Runs on the main thread."""
+    with _lock:
+        if not _state['job'] and _state['queue']:
+            (_, _, job) = heapq.heappop(_state['queue'])
+            _state['job'] = RunningJob(job, 1)
+        running = _state['job']
+    if not running:
+        return
+
+    running.slices += 1
+    slice_end = time.perf_counter() + sliceTime
+    status, result, error = None, None, None
+    with recorded_messages(running.messages):
+        try:
+            if running.steps is None:
+                running.steps = start_job(running.job)
+            while time.perf_counter() < slice_end:
+                if time.perf_counter() - running.started > running.timeout:
+                    running.steps.close()
+                    status, error = 'timeout', f'timed out after {running.timeout} s'
+                    break
+                next(running.steps)
+                running.step_count += 1
+        except StopIteration as done:
+            status, result = 'done', done.value
+        except:
+            status, error = 'failed', traceback.format_exc()
+    if status is None:
+        return
+
+    # Finished: log the attempt, and retry failed jobs
+    retry = (status != 'done' and running.job['kind'] in retriedKinds
+             and running.attempt <= running.job.get('retries', defaultRetries))
+    running.finish('retry' if retry else status, result, error)
+    with _lock:
+        _state['job'] = RunningJob(running.job, running.attempt + 1) if retry else None
+
+
+class recorded_messages():
+    """Records the message boxes shown while a job runs, when quietMessages is set."""
+    def __init__(self, messages: list):
+        self.messages = messages
+        self.original = None
+
+    def __enter__(self):
+        if quietMessages:
+            messages = self.messages
+            def messageBox(ui, text: str, title: str = '', buttons: int = 0, icon: int = 0) -> int:
+                messages.append(text)
+                if buttons == adsk.core.MessageBoxButtonTypes.OKButtonType:
+                    return adsk.core.DialogResults.DialogOK
+                return adsk.core.DialogResults.DialogNo
+            self.original = adsk.core.UserInterface.messageBox
+            adsk.core.UserInterface.messageBox = messageBox
+
+    def __exit__(self, *exc):
+        if self.original:
+            adsk.core.UserInterface.messageBox = self.original
+        return False
+
+
+class JobSliceEventHandler(adsk.core.CustomEventHandler):
+    """Event handler that runs a slice of the jobs on the main thread, and schedules the next slice."""
+    def __init__(self):
+        super().__init__()
+    def notify(self, args: adsk.core.CustomEventArgs):
+        try:
+            with _lock:
+                _state['scheduled'] = False
+            run_slice()
+            with _lock:
+                idle = not (_state['job'] or _state['queue'])
+            if idle and stopWhenIdle:
+                adsk.terminate()
+            else:
+                schedule_slice()
+        except:
+            shared.report_error()
+
+
+# ------------------------------------------------------------------------------
+
+def run(context):
+    try:
+        app = shared.app()
+
+        if not os.path.exists(jobFile):
+            shared.ui().messageBox(f'No job file found at "{jobFile}"')
+            return
+
+        # Register the event that runs the job slices on the main thread
+        app.unregisterCustomEvent(eventId)
+        jobEvent = app.registerCustomEvent(eventId)
+        onJobSlice = JobSliceEventHandler()
+        jobEvent.add(onJobSlice)
+        _handlers.append(onJobSlice) # keep the handler referenced beyond this function
+
+        # Read the job file in the background
+        _stop.clear()
+        feeder = threading.Thread(target=feed_jobs, name='JobSchedulerFeeder', daemon=True)
+        feeder.start()
+        _handlers.append(feeder)
+
+        # prevent this module from being terminate when the script returns, because we are waiting for event _handlers to fire
+        adsk.autoTerminate(False)
+    except:
+        shared.report_error()
+
+
+def stop(context):
+    try:
+        # Stop reading jobs, and interrupt the current job between two steps
+        _stop.set()
+        with _lock:
+            running, _state['job'] = _state['job'], None
+        if running and running.steps is not None:
+            running.steps.close()
+            running.finish('stopped')
+        shared.app().unregisterCustomEvent(eventId)
+    except:
+        shared.report_error()
@@ -1,96 +1,1126 @@
 # Author - Sindre E. Hinderaker
-# Description - Script that exports every document in the current folder to an STEP-format, at a desired file-location.
+# Description - Script that exports every document in the current folder to STEP (and other formats), at a desired file-location.
 
 
-import os, adsk.core, adsk.fusion, traceback
+import os, sys, gc, time, json, shutil, threading, adsk.core, adsk.fusion
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if scripts_path not in sys.path:
+    sys.path.append(scripts_path)  # for the shared helpers
+import tin200_shared as shared
+
+# Only needed by some settings (memory on Windows, post-processing, archives), so imported on first use
+ctypes = shared.lazy_import('ctypes')
+futures = shared.lazy_import('concurrent.futures')
+gzip = shared.lazy_import('gzip')
+hashlib = shared.lazy_import('hashlib')
+subprocess = shared.lazy_import('subprocess')
+tarfile = shared.lazy_import('tarfile')
+zipfile = shared.lazy_import('zipfile')
 
 # Folder path can be modified to alter location of saved
 folder_path = 'C:/Users/HP/Desktop/'
 
-# To change file type the associated export manager must also be used
-file_type = '.step'
+# File types to export. Every document is opened once and exported to all of the file types.
+# Supported file types: '.step', '.stl', '.iges', '.f3d'
+file_types = ['.step']
+
+# Also export every body of the root component to a separate STL-file
+export_body_stl = False
+
+# Incremental export - files whose version is already exported are skipped (without being opened),
+# and exports of files that have been deleted in Fusion 360 are removed from the export folder.
+# The manifest is stored in the exported root folder.
+incremental = True
+manifest_name = 'export_manifest.json'
+
+# Journal of completed files and folders, written while exporting. If an export is cancelled or
+# Fusion 360 crashes, the next run can resume from the last completed file.
+journal_name = 'export_journal.jsonl'
+
+# The folder tree is read from the hub once, before exporting, and cached in the exported root folder.
+# Runs within plan_cache_ttl seconds of the previous run use the cached folder tree instead of the hub.
+plan_cache_name = 'hub_cache.json'
+plan_cache_ttl = 60 * 60
+
+# Dry run - only report what would be exported and pruned, without exporting anything
+dry_run = False
+
+# Resume an interrupted export without asking: None asks, True resumes, False starts over
+resume_interrupted = None
+
+# File types of Fusion 360 designs. Designs that fail to open (e.g. a network error) are counted as failed, and
+# exported in the next run. Other files that can't be opened are stored in the manifest without exports.
+design_file_types = ['f3d']
+
+# Memory limit for Fusion 360 (resident memory, in MB). When the limit is exceeded, the export pauses to let
+# Fusion 360 release memory, for memory_pause seconds, doubled up to memory_pause_retries times while memory
+# stays over the limit. The export then continues, and only pauses again after memory has been below the limit.
+# Set to None to turn off the memory guard.
+memory_limit_mb = 8000
+memory_pause = 2  # [s]
+memory_pause_retries = 3
+# Memory is measured at the start and the end of each export, and otherwise at most once per
+# memory_sample_interval (measuring starts a 'ps' process on macOS)
+memory_sample_interval = 1  # [s]
+
+# Report with export time, peak memory and memory increase of every exported file, written to the exported root folder.
+# Fusion 360 doesn't release memory right after a document is closed, so the increase (from the start of the file
+# to its peak) shows which documents are heavy.
+report_name = 'export_report.json'
+
+# Output store for exported files:
+#   'files'   - exported files are written to the folder tree
+#   'content' - exported files are stored once per unique content (by SHA-256) in an 'objects' folder.
+#               The folder tree is made of hard links to the stored files, and is also listed in content_index_name
+#               (every change to the index is also logged while exporting, so an interrupted export can be resumed).
+#               The file name and time in STEP- and IGES-headers are ignored when comparing content, so
+#               identical files share the header of the first export.
+#   'archive' - exported files are written directly to a single zip- or tar-file (archive_format),
+#               one file at a time, without creating the folder tree. The archive is only complete when it is
+#               closed, so an export resumed after a crash of Fusion 360 starts the archive over.
+output_store = 'files'
+content_index_name = 'content_index.json'
+archive_format = 'zip'
+
+# Post-processing of exported files. This is plain file I/O, and runs in background threads
+# while the next document is exported (the Fusion 360 API must only be used from the main thread).
+# Supported steps:
+#   'sha256' - write a checksum file next to the exported file
+#   'gzip'   - write a compressed copy next to the exported file
+#   'copy'   - copy the exported file to post_copy_path (e.g. a network share)
+#   'bundle' - add the exported file to a zip-file with all files exported in this run (and in the interrupted run it resumes)
+post_process = []
+post_copy_path = None
+bundle_name = 'export_bundle.zip'
+post_workers = 4
+# Maximum number of exported files waiting for post-processing, before the export waits
+post_queue_size = 16
 
 def run(context):
-    ui = None
     try:
-        app = adsk.core.Application.get()
-        ui  = app.userInterface
-
-        data = app.data
+        data = shared.app().data
         #data.activeProject
         #data.activeFolder
+        root_folder = data.activeFolder
+
+        # Export the folder tree, one file at a time
+        for _ in export_steps(root_folder):
+            pass
+
+    except:
+        shared.report_error()
+
+
+# Export a folder tree as a generator that yields after each exported file, so the export can also be
+# run in slices (see Extra/JobScheduler.py). Returns the summary of the export.
+def export_steps(root_folder: adsk.core.DataFolder):
+    ui = shared.ui()
+
+    # Verify the settings before anything is exported
+    error = settings_error()
+    if error:
+        ui.messageBox(error)
+        return
+
+    # Load manifest of previous exports (empty if incremental export is turned off)
+    root_path = os.path.join(folder_path, root_folder.name + '/')
+    export_run = ExportRun(root_path)
+
+    # Plan the export from the folder tree (cached, or read from the hub)
+    plan, cache_age = load_plan(root_folder, root_path, export_run.documents.data_files)
+    if dry_run:
+        report_dry_run(plan, cache_age, export_run)
+        return
+
+    # Resume an interrupted export, or start a new journal
+    if export_run.journal.exists():
+        resume = resume_interrupted
+        if resume is None:
+            resume = ui.messageBox('A previous export of this folder was interrupted.\n'
+                                   'Do you want to resume it?',
+                                   'Resume export',
+                                   adsk.core.MessageBoxButtonTypes.YesNoButtonType) == adsk.core.DialogResults.DialogYes
+        if resume:
+            return (yield from resume_export(plan, export_run))
+    export_run.journal.open(resume=False)
+    export_run.store.open(resume=False)
+    export_run.pipeline.open(resume=False)
+
+    return (yield from export_root_folder(plan, export_run))
+
+
+# Message for the first unsupported setting (file types, post-processing steps and output store), or None
+def settings_error():
+    for export_type in file_types:
+        if export_type not in export_options:
+            return f'Unsupported file-type: "{export_type}"'
+    for step in post_process:
+        if step not in post_steps:
+            return f'Unsupported post-processing step: "{step}"'
+    if 'copy' in post_process and not post_copy_path:
+        return 'Post-processing step "copy" requires post_copy_path'
+    if output_store not in output_stores:
+        return f'Unsupported output store: "{output_store}"'
+    if output_store == 'archive' and (post_process or archive_format not in ('zip', 'tar')):
+        return 'Archive output requires archive_format "zip" or "tar", and no post-processing'
+    return None
+
+
+# Continue an interrupted export from the last file recorded in the journal
+def resume_export(plan: dict, export_run: 'ExportRun'):
+    export_run.summary['resumed'] = export_run.journal.replay(export_run.manifest, export_run.seen)
+    export_run.journal.open(resume=True)
+    export_run.store.open(resume=True)
+    export_run.pipeline.open(resume=True)
+    return (yield from export_root_folder(plan, export_run))
+
+
+def export_root_folder(plan: dict, export_run: 'ExportRun'):
+    ui = shared.ui()
+    summary = export_run.summary
+
+    # One progress bar for all files in the folder tree
+    total, pending = count_files(plan, folder_path, export_run)
+    export_run.progress = ExportProgress(plan['name'], total, pending)
+
+    try:
+        yield from export_folder(plan, folder_path, export_run)
+
+        # Only prune if every folder was read, otherwise files in a failed folder would be removed.
+        # Pruned before the output store is closed, so it saves the pruned content index.
+        if summary['failed'] == 0:
+            prune_manifest(export_run)
+    except ExportCancelled:
+        export_run.pipeline.drain()
+        # Keep the journal, so the export can be resumed
+        save_manifest(export_run.root_path, export_run.manifest)
+        ui.messageBox(f'Export cancelled after exporting {summary["exported"]} files.\n'
+                      'Run the script again to resume the export.')
+        return summary
+    except GeneratorExit:
+        # Stopped between two files (e.g. a job timeout in JobScheduler.py): keep the journal, so the export can be resumed
+        export_run.pipeline.drain()
+        save_manifest(export_run.root_path, export_run.manifest)
+        raise
+    finally:
+        export_run.documents.close_all()
+        export_run.memory.save_report(export_run.root_path, summary)
+        export_run.progress.hide()
+        export_run.journal.close()
+        # Wait for post-processing of the last exported files
+        export_run.pipeline.drain()
+        export_run.store.close()
+
+    save_manifest(export_run.root_path, export_run.manifest)
+
+    # The export is complete when the manifest is saved
+    export_run.journal.remove()
+
+    ui.messageBox(f'Finished exporting folder to "{folder_path}"\n\n'
+                  f'Exported: {summary["exported"]}\n'
+                  f'Skipped (unchanged): {summary["skipped"]}\n'
+                  f'Resumed from journal: {summary["resumed"]}\n'
+                  f'Pruned (deleted in Fusion 360): {summary["pruned"]}\n'
+                  f'Failed folders: {summary["failed"]}\n'
+                  f'Failed files (exported in the next run): {summary["failed_files"]}'
+                  + export_run.store.report()
+                  + export_run.pipeline.report()
+                  + export_run.memory.report())
+    return summary
+
+
+class ExportCancelled(Exception):
+    """Raised when the user cancels the export from the progress dialog."""
+
+
+class ExportRun():
+    """State of an export run: manifest, journal, ids of files found in Fusion 360 and the run summary."""
+    def __init__(self, root_path: str):
+        self.root_path = root_path
+        self.manifest = load_manifest(root_path)
+        self.journal = ExportJournal(root_path)
+        self.store = output_stores[output_store](root_path)
+        self.pipeline = PostExportPipeline(root_path)
+        self.documents = DocumentPool()
+        self.memory = MemoryGuard()
+        self.progress = None
+        self.seen = set()
+        self.summary = {'exported': 0, 'skipped': 0, 'resumed': 0, 'pruned': 0, 'failed': 0, 'failed_files': 0}
+
+
+class DocumentPool():
+    """Documents opened by the export. Each document is closed after it is exported, one is open at a time."""
+    def __init__(self):
+        self.open_documents = []
+        self.data_files = {}  # files by id, from the folder tree read in this run (empty for a cached tree)
+
+    def open(self, file_id: str) -> adsk.core.Document:
+        # Retry closing documents that failed to close earlier
+        self.close_all()
+
+        # Raises if the document can't be opened
+        app = shared.app()
+        data_file = self.data_files.get(file_id) or app.data.findFileById(file_id)
+        document = app.documents.open(data_file, True)
+        if document:
+            self.open_documents.append(document)
+        return document
+
+    def close(self, document: adsk.core.Document) -> bool:
+        """Close a document without saving. Documents that fail to close are kept, and closed later."""
+        if document is None:
+            return True
+        try:
+            document.close(False)
+        except:
+            return False
+        if document in self.open_documents:
+            self.open_documents.remove(document)
+        return True
+
+    def close_all(self):
+        """Close the documents that failed to close earlier. Documents that fail again are kept, and closed later."""
+        for document in list(self.open_documents):
+            self.close(document)
 
-        export_folder(data.activeFolder)
-            
-        ui.messageBox(f'Finished exporting folder to "{folder_path}"')
 
+class MemoryGuard():
+    """Measures memory used by Fusion 360, and pauses the export when memory_limit_mb is exceeded."""
+    def __init__(self):
+        self.files = []
+        self.pauses = 0
+        self._start = None
+        self._peak = None
+        self._over_limit = False
+
+    def check(self, documents: DocumentPool):
+        memory = resident_memory_mb()
+        if memory_limit_mb is None or memory is None or memory < memory_limit_mb:
+            self._over_limit = False
+            return
+
+        # Pause once each time the limit is exceeded (pausing for every file wouldn't release more memory)
+        if self._over_limit:
+            return
+        self._over_limit = True
+        self.pauses += 1
+
+        # Close documents that failed to close, and give Fusion 360 time to release the memory
+        documents.close_all()
+        pause = memory_pause
+        for _ in range(memory_pause_retries):
+            gc.collect()
+            adsk.doEvents()
+            time.sleep(pause)
+            memory = resident_memory_mb(cached=False)
+            if memory is None or memory < memory_limit_mb:
+                self._over_limit = False
+                break
+            pause *= 2
+
+    def start_file(self):
+        # Measured now, since a cached measurement may include the peak of the previous file
+        self._start = self._peak = resident_memory_mb(cached=False)
+
+    def sample(self, cached: bool = True):
+        memory = resident_memory_mb(cached)
+        if memory is not None and (self._peak is None or memory > self._peak):
+            self._peak = memory
+
+    def end_file(self, file: dict, seconds: float):
+        increase = None if self._start is None or self._peak is None else self._peak - self._start
+        self.files.append({'id': file['id'],
+                           'name': file['name'],
+                           'version': file['version'],
+                           'seconds': round(seconds, 2),
+                           'peak_memory_mb': self._peak,
+                           'memory_increase_mb': increase})
+
+    def save_report(self, root_path: str, summary: dict):
+        if not self.files:
+            return
+        with open(os.path.join(root_path, report_name), 'w') as f:
+            json.dump({'summary': summary, 'memory_pauses': self.pauses, 'files': self.files}, f, indent=2)
+
+    def report(self) -> str:
+        measured = [file for file in self.files if file['memory_increase_mb'] is not None]
+        if not measured:
+            return ''
+        heaviest = sorted(measured, key=lambda file: file['memory_increase_mb'], reverse=True)[:3]
+        text = f'\nPauses for memory: {self.pauses}\nLargest memory increase:'
+        for file in heaviest:
+            text += f'\n  {file["name"]}: +{file["memory_increase_mb"]} MB (peak {file["peak_memory_mb"]} MB)'
+        return text
+
+
+# Last memory measurement, reused for memory_sample_interval
+_memory_sample = {'time': None, 'mb': None}
+
+# Resident memory of the Fusion 360 process in MB, or None if it can't be measured
+def resident_memory_mb(cached: bool = True):
+    now = time.monotonic()
+    if cached and _memory_sample['time'] is not None and now - _memory_sample['time'] < memory_sample_interval:
+        return _memory_sample['mb']
+    _memory_sample['time'] = now
+    _memory_sample['mb'] = measure_resident_memory_mb()
+    return _memory_sample['mb']
+
+
+def measure_resident_memory_mb():
+    try:
+        if sys.platform == 'win32':
+            class PROCESS_MEMORY_COUNTERS(ctypes.Structure):
+                _fields_ = [('cb', ctypes.c_ulong),
+                            ('PageFaultCount', ctypes.c_ulong),
+                            ('PeakWorkingSetSize', ctypes.c_size_t),
+                            ('WorkingSetSize', ctypes.c_size_t),
+                            ('QuotaPeakPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaPeakNonPagedPoolUsage', ctypes.c_size_t),
+                            ('QuotaNonPagedPoolUsage', ctypes.c_size_t),
+                            ('PagefileUsage', ctypes.c_size_t),
+                            ('PeakPagefileUsage', ctypes.c_size_t)]
+            counters = PROCESS_MEMORY_COUNTERS()
+            counters.cb = ctypes.sizeof(counters)
+            process = ctypes.windll.kernel32.GetCurrentProcess()
+            if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+                return None
+            return counters.WorkingSetSize // (1024 * 1024)
+        elif os.path.exists('/proc/self/statm'):
+            # Resident set size in pages (Linux)
+            with open('/proc/self/statm') as f:
+                return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') // (1024 * 1024)
+        else:
+            # Resident set size in kB
+            output = subprocess.run(['ps', '-o', 'rss=', '-p', str(os.getpid())], capture_output=True, text=True)
+            return int(output.stdout.strip()) // 1024
     except:
-        if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
-
-
-# Recursive function to process the contents of the folder.
-def export_folder(folder: adsk.core.DataFolder):
-    ui = None
-    try:        
-        app = adsk.core.Application.get()
-        documents = app.documents
-        ui  = app.userInterface
-
-        # ui.messageBox('Processing folder: ' + folder.name)
-
-        # Create directory/folder with folder name from Fusion 360
-        file_path = os.path.join(folder_path, folder.name + '/')
-        os.mkdir(file_path)
-
-        # Create progress bar
-        export_progress = ui.createProgressDialog()
-        export_progress.show(title=f'Exporting: {folder.name}', 
-                            message='Processing file %v of %m (%p %)',
-                            minimumValue=0, 
-                            maximumValue=folder.dataFiles.count, 
-                            delay=0)
+        return None
+
+
+class ExportProgress():
+    """Progress bar for the whole export, with the remaining time estimated from the measured export time per file."""
+    def __init__(self, title: str, total: int, pending: int):
+        ui = shared.ui()
+        self.pending = pending  # files that are not exported yet
+        self.value = 0
+        self.processed = 0
+        self.process_time = 0.0
+
+        self.dialog = ui.createProgressDialog()
+        self.dialog.show(title=f'Exporting: {title}',
+                         message='Processing file %v of %m (%p %)',
+                         minimumValue=0,
+                         maximumValue=total,
+                         delay=0)
         # %p - percentage completed
         # %v - current value
         # %m - total steps
-        
+
+    def next_file(self):
+        # Stop between files if the user has cancelled the export
+        if self.dialog.wasCancelled:
+            raise ExportCancelled()
+
+        # Increment progress bar value
+        self.value += 1
+        self.dialog.progressValue = self.value
+
+    def file_processed(self, seconds: float):
+        """Update the estimate after a file has been opened and exported."""
+        self.processed += 1
+        self.process_time += seconds
+        self.pending = max(self.pending - 1, 0)
+        remaining = self.process_time / self.processed * self.pending
+        self.dialog.message = f'Processing file %v of %m (%p %) - about {format_duration(remaining)} left'
+
+    def hide(self):
+        self.dialog.hide()
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f'{round(seconds)} s'
+    if seconds < 60 * 60:
+        return f'{round(seconds / 60)} min'
+    return f'{seconds / 60 / 60:.1f} h'
+
+
+# Load the cached folder tree, or read it from the hub if the cache is missing or too old.
+# Returns the folder tree, and the age of the cache in seconds (None if read from the hub).
+# Files read from the hub are added to data_files (by id), so they don't have to be looked up again.
+def load_plan(root_folder: adsk.core.DataFolder, root_path: str, data_files: dict):
+    cache_file = os.path.join(root_path, plan_cache_name)
+    if os.path.exists(cache_file):
+        with open(cache_file) as f:
+            cache = json.load(f)
+        age = time.time() - cache['created']
+        if cache['plan']['id'] == root_folder.id and age < plan_cache_ttl:
+            return cache['plan'], age
+
+    plan = plan_folder(root_folder, data_files)
+
+    os.makedirs(root_path, exist_ok=True)
+    with open(cache_file, 'w') as f:
+        json.dump({'created': time.time(), 'plan': plan}, f)
+    return plan, None
+
+
+# Recursive function to read the folder tree from the hub, with the metadata needed for exporting
+def plan_folder(folder: adsk.core.DataFolder, data_files: dict) -> dict:
+    files = []
+    for file in folder.dataFiles:
+        data_files[file.id] = file
+        files.append({'id': file.id,
+                      'name': file.name,
+                      'version': file.versionNumber,
+                      'type': file.fileExtension})
+    folders = [plan_folder(subFolder, data_files) for subFolder in folder.dataFolders]
+    return {'id': folder.id, 'name': folder.name, 'files': files, 'folders': folders}
+
+
+# Count all files in the folder tree, and the files that are not exported yet
+def count_files(folder: dict, parent_path: str, export_run: 'ExportRun'):
+    file_path = os.path.join(parent_path, folder['name'] + '/')
+    total = len(folder['files'])
+    pending = sum(not is_exported(export_run, file, file_path + file['name']) for file in folder['files'])
+    for subFolder in folder['folders']:
+        sub_total, sub_pending = count_files(subFolder, file_path, export_run)
+        total += sub_total
+        pending += sub_pending
+    return total, pending
+
+
+def report_dry_run(plan: dict, cache_age: float, export_run: 'ExportRun'):
+    ui = shared.ui()
+
+    total, pending = count_files(plan, folder_path, export_run)
+    ids = set()
+    collect_file_ids(plan, ids)
+    prune = sum(1 for file_id, entry in export_run.manifest.items() if file_id not in ids and entry['paths'])
+
+    source = 'read from the hub' if cache_age is None else f'cached {format_duration(cache_age)} ago'
+    ui.messageBox(f'Dry run of "{plan["name"]}" (folder tree {source})\n\n'
+                  f'Files: {total}\n'
+                  f'To export: {pending}\n'
+                  f'Unchanged: {total - pending}\n'
+                  f'To prune: {prune}')
+
+
+def collect_file_ids(folder: dict, ids: set):
+    ids.update(file['id'] for file in folder['files'])
+    for subFolder in folder['folders']:
+        collect_file_ids(subFolder, ids)
+
+
+# Recursive function to process the contents of a folder in the planned folder tree.
+# Yields after each exported file.
+def export_folder(folder: dict, parent_path: str, export_run: ExportRun):
+    manifest = export_run.manifest
+    summary = export_run.summary
+    journal = export_run.journal
+    failed = (summary['failed'], summary['failed_files'])
+    try:
+        # Skip folders that were completed before the export was interrupted
+        if folder['id'] in journal.completed_folders:
+            return
+
+        # ui.messageBox('Processing folder: ' + folder['name'])
+
+        # Create directory/folder with folder name from Fusion 360 (reused if it already exists)
+        file_path = os.path.join(parent_path, folder['name'] + '/')
+        export_run.store.make_folder(file_path)
+
         # Loop over files in folder
-        for i, file in enumerate(folder.dataFiles):
-            # ui.messageBox('Processing: ' + file.name)
+        file_ids = []
+        for file in folder['files']:
+            # ui.messageBox('Processing: ' + file['name'])
+
+            export_run.progress.next_file()
+
+            # Mark file as found, so its export is not pruned
+            export_run.seen.add(file['id'])
+            file_ids.append(file['id'])
+            base_path = file_path + file['name']
 
-            # Increment progress bar value
-            export_progress.progressValue = i + 1
+            # Skip files that are unchanged since the last export
+            if is_exported(export_run, file, base_path):
+                summary['skipped'] += 1
+                continue
 
-            # Try opening the document but gracefully fail and 
-            # assume the document isn't a Fusion document.            
+            # Pause if Fusion 360 uses too much memory
+            export_run.memory.check(export_run.documents)
+
+            start = time.time()
+            export_run.memory.start_file()
             try:
-                document = documents.open(file, True)
+                document = export_run.documents.open(file['id'])
             except:
+                # Files that aren't designs can't be opened, and are stored without exports below
                 document = None
+                if file['type'] in design_file_types:
+                    # Keep the previous export and manifest entry, so the design is exported in the next run
+                    summary['failed_files'] += 1
+                    export_run.progress.file_processed(time.time() - start)
+                    yield
+                    continue
+
+            des = None
+            paths = []
+            try:
+                if document:
+                    export_run.memory.sample()
+
+                    # Find the Design product in the document.
+                    for prod in document.products:
+                        if prod.objectType == adsk.fusion.Design.classType():
+                            des = prod
+                            break
+
+                    if des:
+                        # Export all file types from the opened document
+                        paths = export_design(des, base_path, export_run)
+                        # Measured after every export, so the increase of a short export isn't a cached measurement
+                        export_run.memory.sample(cached=False)
+            finally:
+                # Always close the document, also when it isn't a design or the export failed
+                export_run.documents.close(document)
+            export_run.memory.end_file(file, time.time() - start)
+
+            # Remove previous exports that were not overwritten (moved or renamed file, or changed file types)
+            previous = manifest.get(file['id'])
+            if previous:
+                for path in previous['paths']:
+                    if path not in paths:
+                        remove_export(export_run, path)
+
+            # Store the exported version (files that are not designs are stored without exports)
+            manifest[file['id']] = {'name': file['name'],
+                                    'version': file['version'],
+                                    'formats': export_formats(),
+                                    'paths': paths}
+            if des:
+                summary['exported'] += 1
+            export_run.progress.file_processed(time.time() - start)
+
+            # Record the completed file, so it is not exported again if the export is resumed
+            journal.record_file(file['id'], manifest[file['id']])
+            yield
 
-            if document:            
-                # Find the Design product in the document.
-                for prod in document.products:
-                    if prod.objectType == adsk.fusion.Design.classType():
-                        des = prod
-                        break
-                    
-                if des:
-                    # Get the ExportManager from the active design.
-                    exp_manager = des.exportManager
-
-                    # Create a export options object and specify file type
-                    exp_options = exp_manager.createSTEPexp_options(file_path + document.name + file_type)
-
-                    # Execute export
-                    res = exp_manager.execute(exp_options)
-                                
-                    document.close(False)
-                    
-        for subFolder in folder.dataFolders:
-            export_folder(subFolder)
+        for subFolder in folder['folders']:
+            yield from export_folder(subFolder, file_path, export_run)
 
+        # Record the completed folder, unless a file or sub-folder failed
+        if (summary['failed'], summary['failed_files']) == failed:
+            journal.record_folder(folder['id'], file_ids)
+
+    except (ExportCancelled, GeneratorExit):
+        raise
     except:
-        if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+        summary['failed'] += 1
+        shared.report_error()
+
+
+# Export options for each supported file type, created from the export manager of a design
+export_options = {
+    '.step': lambda exp_manager, path, geometry: exp_manager.createSTEPExportOptions(path, geometry),
+    '.stl':  lambda exp_manager, path, geometry: exp_manager.createSTLExportOptions(geometry, path),
+    '.iges': lambda exp_manager, path, geometry: exp_manager.createIGESExportOptions(path, geometry),
+    '.f3d':  lambda exp_manager, path, geometry: exp_manager.createFusionArchiveExportOptions(path, geometry),
+}
+
+
+# Export an opened design to every file type, and return the paths of the exported files
+def export_design(des: adsk.fusion.Design, base_path: str, export_run: ExportRun):
+    # Get the ExportManager and root component from the design.
+    exp_manager = des.exportManager
+    root_comp = des.rootComponent
+
+    # File types to export, with the geometry to export
+    exports = [(base_path + export_type, export_type, root_comp) for export_type in file_types]
+
+    # Export bodies of the root component as separate STL-files
+    if export_body_stl:
+        exports += [(f'{base_path} - {body.name}.stl', '.stl', body) for body in root_comp.bRepBodies]
+
+    paths = []
+    for path, export_type, geometry in exports:
+        # Create a export options object for the file type and execute export to the output store
+        staged_path = export_run.store.stage(path)
+        exp_options = export_options[export_type](exp_manager, staged_path, geometry)
+        exp_manager.execute(exp_options)
+        stored_path = export_run.store.commit(staged_path, path)
+        paths.append(path)
+
+        # Post-process the exported file in the background
+        if stored_path:
+            export_run.pipeline.submit(stored_path)
+
+    return paths
+
+
+# File types of the current export, stored in the manifest to detect changed settings
+def export_formats():
+    return file_types + ['bodies.stl'] if export_body_stl else list(file_types)
+
+
+# Check if a file is exported with its current version and file types
+def is_exported(export_run: ExportRun, file: dict, base_path: str):
+    entry = export_run.manifest.get(file['id'])
+    if not entry or entry['version'] != file['version']:
+        return False
+    # Files without a design have nothing to export
+    if not entry['paths']:
+        return True
+    if entry['formats'] != export_formats():
+        return False
+    # Moved or renamed files are exported again
+    expected = [base_path + export_type for export_type in file_types]
+    if entry['paths'][:len(expected)] != expected:
+        return False
+    return all(export_run.store.exists(path) for path in entry['paths'])
+
+
+# Remove exports of files that were not found in Fusion 360 during this run
+def prune_manifest(export_run: ExportRun):
+    manifest = export_run.manifest
+    for file_id in list(manifest):
+        if file_id in export_run.seen:
+            continue
+        entry = manifest.pop(file_id)
+        if entry['paths']:
+            for path in entry['paths']:
+                remove_export(export_run, path)
+            export_run.summary['pruned'] += 1
+
+
+class ExportJournal():
+    """
+    Write-ahead journal of completed files and folders. Every record is flushed to disk
+    before the next file is exported, so an interrupted export can be resumed.
+    """
+    def __init__(self, root_path: str):
+        self.path = os.path.join(root_path, journal_name)
+        self.completed_folders = set()
+        self._file = None
+
+    def exists(self) -> bool:
+        """The journal is removed when an export is finished, so an existing journal is unfinished."""
+        return os.path.exists(self.path)
+
+    def replay(self, manifest: dict, seen: set) -> int:
+        """Apply the journal to the manifest, and return the number of completed files."""
+        count = 0
+        with open(self.path) as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # last record was not completely written
+                if record['type'] == 'file':
+                    manifest[record['id']] = record['entry']
+                    seen.add(record['id'])
+                    count += 1
+                elif record['type'] == 'folder':
+                    self.completed_folders.add(record['id'])
+                    seen.update(record['files'])
+        return count
+
+    def open(self, resume: bool):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'a' if resume else 'w')
+
+    def record_file(self, file_id: str, entry: dict):
+        self._write({'type': 'file', 'id': file_id, 'entry': entry})
+
+    def record_folder(self, folder_id: str, file_ids: list):
+        self._write({'type': 'folder', 'id': folder_id, 'files': file_ids})
+
+    def _write(self, record: dict):
+        self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        if self._file:
+            self._file.close()
+            self._file = None
+
+    def remove(self):
+        self.close()
+        if self.exists():
+            os.remove(self.path)
+
+
+class PostExportPipeline():
+    """
+    Post-processes exported files in a thread pool. The queue is bounded by post_queue_size,
+    so the export waits when post-processing can't keep up.
+    """
+    def __init__(self, root_path: str):
+        self.root_path = root_path
+        self.processed = 0
+        self.errors = []
+        self._executor = None
+        self._futures = []
+        self._slots = threading.BoundedSemaphore(post_queue_size)
+        self._bundle = None
+        self._bundle_mode = 'w'
+        self._bundle_lock = threading.Lock()
+
+    def open(self, resume: bool):
+        # A resumed export adds to the bundle of the interrupted export
+        if resume and os.path.exists(os.path.join(self.root_path, bundle_name)):
+            self._bundle_mode = 'a'
+
+    def submit(self, path: str):
+        if not post_process:
+            return
+        if self._executor is None:
+            self._executor = futures.ThreadPoolExecutor(max_workers=post_workers)
+        # Wait for a free slot in the queue
+        self._slots.acquire()
+        future = self._executor.submit(self._process, path)
+        future.add_done_callback(lambda future: self._slots.release())
+        self._futures.append(future)
+
+    def _process(self, path: str) -> bool:
+        try:
+            for step in post_process:
+                post_steps[step](self, path)
+            return True
+        except Exception as e:
+            self.errors.append(f'{path}: {e}')
+            return False
+
+    def add_to_bundle(self, path: str):
+        # Zip-files can't be written from several threads at once
+        with self._bundle_lock:
+            if self._bundle is None:
+                self._bundle = zipfile.ZipFile(os.path.join(self.root_path, bundle_name), self._bundle_mode, zipfile.ZIP_DEFLATED)
+                # Files added after a drain are added to the same bundle
+                self._bundle_mode = 'a'
+            self._bundle.write(path, os.path.relpath(path, self.root_path))
+
+    def drain(self):
+        """Wait for all queued files to be post-processed. Can be called more than once."""
+        if self._executor is None:
+            return
+        futures.wait(self._futures)
+        self.processed += sum(future.result() for future in self._futures)
+        self._executor.shutdown()
+        self._executor = None
+        self._futures = []
+        if self._bundle is not None:
+            self._bundle.close()
+            self._bundle = None
+
+    def report(self) -> str:
+        if not post_process:
+            return ''
+        text = f'\nPost-processed ({", ".join(post_process)}): {self.processed}'
+        if self.errors:
+            text += f'\nPost-processing errors: {len(self.errors)}\n' + '\n'.join(self.errors[:10])
+        return text
+
+
+def file_sha256(path: str) -> str:
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+# SHA-256 of an exported file, without the header fields that change with every export:
+# the FILE_NAME entry of STEP-files (file name and time), and the start and global sections of IGES-files.
+def content_sha256(path: str) -> str:
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in ('.step', '.stp', '.iges', '.igs'):
+        return file_sha256(path)
+
+    sha256 = hashlib.sha256()
+    with open(path, 'rb') as f:
+        if extension in ('.step', '.stp'):
+            in_file_name = False
+            for line in f:
+                if not in_file_name and line.lstrip().startswith(b'FILE_NAME'):
+                    in_file_name = True
+                if in_file_name:
+                    in_file_name = not line.rstrip().endswith(b';')
+                    continue
+                sha256.update(line)
+        else:
+            # IGES-records have the section letter in column 73
+            for line in f:
+                if line[72:73] not in (b'S', b'G'):
+                    sha256.update(line)
+    return sha256.hexdigest()
+
+
+def write_checksum(pipeline: PostExportPipeline, path: str):
+    with open(path + '.sha256', 'w') as f:
+        f.write(f'{file_sha256(path)}  {os.path.basename(path)}\n')
+
+
+def write_compressed(pipeline: PostExportPipeline, path: str):
+    with open(path, 'rb') as f_in, gzip.open(path + '.gz', 'wb') as f_out:
+        shutil.copyfileobj(f_in, f_out)
+
+
+def copy_to_share(pipeline: PostExportPipeline, path: str):
+    target = os.path.join(post_copy_path, os.path.relpath(path, folder_path))
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    shutil.copy2(path, target)
+
+
+# Post-processing steps, run in order for each exported file
+post_steps = {
+    'sha256': write_checksum,
+    'gzip':   write_compressed,
+    'copy':   copy_to_share,
+    'bundle': PostExportPipeline.add_to_bundle,
+}
+
+
+class FileStore():
+    """Output store that writes exported files directly to the folder tree."""
+    def __init__(self, root_path: str):
+        self.root_path = root_path
+
+    def open(self, resume: bool):
+        pass
+
+    def make_folder(self, path: str):
+        os.makedirs(path, exist_ok=True)
+
+    def stage(self, path: str) -> str:
+        """Path the export manager should write the exported file to."""
+        return path
+
+    def commit(self, staged_path: str, path: str) -> str:
+        """Store an exported file, and return its path on disk (or None if it is not stored as a file)."""
+        return path
+
+    def exists(self, path: str) -> bool:
+        return os.path.exists(path)
+
+    def remove(self, path: str):
+        if os.path.exists(path):
+            os.remove(path)
+
+    def close(self):
+        pass
+
+    def report(self) -> str:
+        return ''
+
+
+class ContentStore(FileStore):
+    """
+    Output store that saves every unique exported file once, named by its SHA-256 hash.
+    Files with identical content share the stored file through hard links in the folder tree.
+    """
+    def __init__(self, root_path: str):
+        super().__init__(root_path)
+        self.objects_path = os.path.join(root_path, 'objects')
+        self.staging_path = os.path.join(root_path, 'staging')
+        self.index_file = os.path.join(root_path, content_index_name)
+        self.log_file = os.path.splitext(self.index_file)[0] + '.jsonl'
+        self.index = {}
+        if os.path.exists(self.index_file):
+            with open(self.index_file) as f:
+                self.index = json.load(f)
+        self.stored = 0
+        self.deduplicated = 0
+        self._log = None
+
+        # Changes logged by an export that was interrupted before the index was saved
+        if os.path.exists(self.log_file):
+            with open(self.log_file) as f:
+                for line in f:
+                    try:
+                        (path, object_name) = json.loads(line)
+                    except ValueError:
+                        break  # last change was not completely written
+                    if object_name is None:
+                        self.index.pop(path, None)
+                    else:
+                        self.index[path] = object_name
+
+    def open(self, resume: bool):
+        os.makedirs(self.root_path, exist_ok=True)
+        self._log = open(self.log_file, 'a')
+
+    def stage(self, path: str) -> str:
+        os.makedirs(self.staging_path, exist_ok=True)
+        return os.path.join(self.staging_path, os.path.basename(path))
+
+    def commit(self, staged_path: str, path: str) -> str:
+        # Move the exported file to the objects folder, unless the same content is already stored
+        digest = content_sha256(staged_path)
+        object_name = digest + os.path.splitext(path)[1]
+        object_path = self._object_path(object_name)
+        if os.path.exists(object_path):
+            os.remove(staged_path)
+            self.deduplicated += 1
+        else:
+            os.makedirs(os.path.dirname(object_path), exist_ok=True)
+            os.replace(staged_path, object_path)
+            self.stored += 1
+        self._set_index(os.path.relpath(path, self.root_path), object_name)
+
+        # Link the stored file into the folder tree. If the file system doesn't support
+        # hard links, the folder tree is only listed in the content index.
+        if os.path.exists(path):
+            os.remove(path)
+        try:
+            os.link(object_path, path)
+            return path
+        except OSError:
+            return object_path
+
+    def exists(self, path: str) -> bool:
+        object_name = self.index.get(os.path.relpath(path, self.root_path))
+        return object_name is not None and os.path.exists(self._object_path(object_name))
+
+    def remove(self, path: str):
+        super().remove(path)
+        self._set_index(os.path.relpath(path, self.root_path), None)
+
+    def _set_index(self, path: str, object_name: str):
+        """Change the index entry of a path (None removes it), and log the change before the next file is exported."""
+        if object_name is None:
+            self.index.pop(path, None)
+        else:
+            self.index[path] = object_name
+        self._log.write(json.dumps([path, object_name]) + '\n')
+        self._log.flush()
+        os.fsync(self._log.fileno())
+
+    def close(self):
+        with open(self.index_file, 'w') as f:
+            json.dump(self.index, f, indent=2)
+        # The saved index has every logged change
+        if self._log:
+            self._log.close()
+            self._log = None
+        if os.path.exists(self.log_file):
+            os.remove(self.log_file)
+
+        # Remove stored files that are no longer in the folder tree
+        referenced = set(self.index.values())
+        if os.path.exists(self.objects_path):
+            for directory, _, names in os.walk(self.objects_path):
+                for name in names:
+                    if name not in referenced:
+                        os.remove(os.path.join(directory, name))
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+
+    def report(self) -> str:
+        return f'\nStored files: {self.stored} new, {self.deduplicated} identical to a stored file'
+
+    def _object_path(self, object_name: str) -> str:
+        return os.path.join(self.objects_path, object_name[:2], object_name)
+
+
+class ArchiveStore(FileStore):
+    """
+    Output store that writes every exported file directly to a zip- or tar-file.
+    Each file is exported to a staging folder and moved into the archive before the next export.
+    The archive is written to a partial file, which is renamed when the archive is closed.
+    """
+    def __init__(self, root_path: str):
+        super().__init__(root_path)
+        root_name = os.path.basename(os.path.normpath(root_path))
+        self.archive_path = os.path.join(root_path, f'{root_name}.{archive_format}')
+        self.partial_path = self.archive_path + '.partial'
+        self.staging_path = os.path.join(root_path, 'staging')
+        self.names = set()
+        self.written = 0
+        self._archive = None
+
+    def open(self, resume: bool):
+        # A resumed export is added to the archive of the interrupted export. A partial archive is left by
+        # a crash, and can't be read (the index of a zip-file is written when it is closed), so it is started over.
+        os.makedirs(self.root_path, exist_ok=True)
+        mode = 'w'
+        if resume and os.path.exists(self.archive_path) and not os.path.exists(self.partial_path):
+            os.replace(self.archive_path, self.partial_path)
+            mode = 'a'
+        if archive_format == 'zip':
+            self._archive = zipfile.ZipFile(self.partial_path, mode, zipfile.ZIP_DEFLATED)
+            self.names = set(self._archive.namelist())
+        else:
+            self._archive = tarfile.open(self.partial_path, mode)
+            self.names = set(self._archive.getnames())
+
+    def make_folder(self, path: str):
+        pass
+
+    def stage(self, path: str) -> str:
+        os.makedirs(self.staging_path, exist_ok=True)
+        return os.path.join(self.staging_path, os.path.basename(path))
+
+    def commit(self, staged_path: str, path: str) -> str:
+        name = os.path.relpath(path, self.root_path).replace(os.sep, '/')
+        if archive_format == 'zip':
+            self._archive.write(staged_path, name)
+        else:
+            self._archive.add(staged_path, name)
+        os.remove(staged_path)
+        self.names.add(name)
+        self.written += 1
+        return None
+
+    def exists(self, path: str) -> bool:
+        return os.path.relpath(path, self.root_path).replace(os.sep, '/') in self.names
+
+    def remove(self, path: str):
+        # Files can't be removed from an archive; every new export writes a new archive
+        pass
+
+    def close(self):
+        if self._archive is not None:
+            self._archive.close()
+            self._archive = None
+            os.replace(self.partial_path, self.archive_path)
+        shutil.rmtree(self.staging_path, ignore_errors=True)
+
+    def report(self) -> str:
+        return f'\nArchive: "{self.archive_path}" ({self.written} files added)'
+
+
+output_stores = {
+    'files':   FileStore,
+    'content': ContentStore,
+    'archive': ArchiveStore,
+}
+
+
+# Remove an exported file, and files written next to it by post-processing
+def remove_export(export_run: ExportRun, path: str):
+    export_run.store.remove(path)
+    for suffix in ('.sha256', '.gz'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+
+
+def load_manifest(root_path: str):
+    manifest_file = os.path.join(root_path, manifest_name)
+    if not incremental or not os.path.exists(manifest_file):
+        return {}
+    with open(manifest_file) as f:
+        return json.load(f)
+
 
+def save_manifest(root_path: str, manifest: dict):
+    if not incremental:
+        return
+    os.makedirs(root_path, exist_ok=True)
+    # Write to a temporary file first, so an interrupted save does not corrupt the manifest
+    manifest_file = os.path.join(root_path, manifest_name)
+    with open(manifest_file + '.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(manifest_file + '.tmp', manifest_file)
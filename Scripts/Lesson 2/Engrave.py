@@ -1,84 +1,331 @@
 # Author - Sindre E. Hinderaker
 # Description - Script that engraves a predetermined text at the senter og a user-selected face.
 
-import adsk.core, adsk.fusion, adsk.cam, traceback
+import os, sys, json
+import adsk.core, adsk.fusion
+from math import atan2
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if scripts_path not in sys.path:
+    sys.path.append(scripts_path)  # for the shared helpers
+import tin200_shared as shared
 
 # Global default engraving parameters
 engravedText = "TIN200"
 textHeight = 1
 engraveDepth = 0.1
 
+# Batch engraving - engrave many faces in one run. Faces on the same body and plane share
+# one construction plane, one sketch and one cut feature.
+# Faces are taken from (in order): faces selected before running the script, faceTokens
+# (entity tokens of faces), or faces selected one at a time until the selection is cancelled.
+batchMode = False
+faceTokens = []
+# Text template for each face: {serial} - serial number, {index} - face number (from 1), {body} - body name
+textTemplate = 'SN{serial:04d}'
+firstSerial = 1
+
+# Face analysis - text is sized and placed to fit the largest rectangle inside each face, along its longest side.
+# Results are cached by entity token, and stored as attributes on the faces so later runs can skip the analysis.
+autoTextHeight = True
+analysisSamples = 24    # Samples along the longest side of the face
+textFill = 0.8          # Fraction of the rectangle used by the text
+charWidth = 0.7         # Approximate character width, relative to the text height
+persistAnalysis = True
+attributeGroup = 'Engrave'
+
+# Face analyses by face signature (area and bounding box), as lists of (face, analysis). Entity tokens of the same
+# face may differ, so the faces are compared as entities
+_face_cache = {}
+
 def run(context):
-    ui = None
     try:
-        # Get Fusino 360 application, user interface, and active design-document
-        app = adsk.core.Application.get()
-        ui  = app.userInterface
-        design = adsk.fusion.Design.cast(app.activeProduct)
+        # Get Fusino 360 user interface, and active design-document
+        ui = shared.ui()
+        design = shared.design()
 
         # Verify correct workspace
         if not design:
             ui.messageBox('Current workspace is not supported, please change to "Design" workspace and try again.')
             return
-        
+
         # Get root component
         root_comp = design.rootComponent
 
-        # Prompt user to select a face and store in variable
-        selected_face = ui.selectEntity('Select a surface for engraving: ', 'Faces').entity
-        #ui.messageBox(f'Selected face centroid: {selected_face.centroid.asArray()}')
-        
-        # Find shortest edge of face
-        shortest_edge = min([edge.length for edge in selected_face.edges])
-
-        # Update text height parameter
-        textHeight = shortest_edge/10
-
-        # Create construction plane on selected face 
-        # This will ensure that origo for this sketch is at the center of the face (not relative to the root component)
-        const_plane_input = root_comp.constructionPlanes.createInput()
-        const_plane_input.setByOffset(selected_face, adsk.core.ValueInput.createByReal(1))
-        const_plane = root_comp.constructionPlanes.add(const_plane_input)
-
-        # Create sketch on selected face
-        sketch = root_comp.sketches.add(const_plane)
-
-        # Draw text on sketch
-        texts = sketch.sketchTexts
-        engrave_input = texts.createInput2(formattedText=engravedText, height=textHeight)
-        
+        if batchMode:
+            # Get faces for batch engraving, and a text for each face
+            faces = get_batch_faces(design, ui)
+            if not faces:
+                ui.messageBox('No faces selected for engraving.')
+                return
+            texts = batch_texts(faces)
+        else:
+            # Prompt user to select a face and store in variable
+            selected_face = ui.selectEntity('Select a surface for engraving: ', 'Faces').entity
+            #ui.messageBox(f'Selected face centroid: {selected_face.centroid.asArray()}')
+            faces = [selected_face]
+            texts = [engravedText]
+
+        # Engrave each group of faces with one sketch and one cut
+        steps = engrave_steps(root_comp, faces, texts)
+        while True:
+            try:
+                next(steps)
+            except StopIteration as done:
+                (groups, failures) = done.value
+                break
+
+        if failures:
+            ui.messageBox(f'Engraved {groups} sketches and cut features, failed:\n' + '\n'.join(failures))
+        elif batchMode:
+            ui.messageBox(f'Engraved {len(faces)} faces, with {groups} sketches and cut features.')
+
+    except:
+        shared.report_error()
+
+
+def get_batch_faces(design: adsk.fusion.Design, ui: adsk.core.UserInterface, interactive: bool = True) -> list:
+    """
+    Planar faces selected before running the script, from faceTokens, or selected one at a time
+    (unless interactive is False, e.g. in an unattended job).
+    """
+    # Faces selected before running the script
+    selections = ui.activeSelections
+    faces = [selections.item(i).entity for i in range(selections.count)]
+    faces = [face for face in faces if is_planar_face(face)]
+    if faces:
+        return faces
+
+    # Faces from entity tokens
+    if faceTokens:
+        for token in faceTokens:
+            faces += [entity for entity in design.findEntityByToken(token) if is_planar_face(entity)]
+        return faces
+    if not interactive:
+        return faces
+
+    # Select faces until the selection is cancelled
+    while True:
+        try:
+            selection = ui.selectEntity(f'Select face {len(faces) + 1} for engraving (Esc to finish): ', 'PlanarFaces')
+        except:
+            break
+        faces.append(selection.entity)
+    return faces
+
+
+def is_planar_face(entity) -> bool:
+    """True for planar faces, like the 'PlanarFaces' selection filter (texts can only be engraved on planes)."""
+    return (entity.objectType == adsk.fusion.BRepFace.classType()
+            and entity.geometry.objectType == adsk.core.Plane.classType())
+
+
+def batch_texts(faces: list) -> list:
+    """Text for each face in a batch, from textTemplate."""
+    return [textTemplate.format(serial=firstSerial + i, index=i + 1, body=face.body.name) for i, face in enumerate(faces)]
+
+
+def engrave_steps(root_comp: adsk.fusion.Component, faces: list, texts: list):
+    """
+    Engraves the faces in groups (one sketch and one cut per body and plane), as a generator that yields the
+    number of handled groups after each group, so a batch can also be run in slices (see Extra/JobScheduler.py).
+    Groups that fail are reported, and the other groups are still engraved.
+    Returns the number of engraved groups, and a message for each failed group.
+    """
+    engraved = 0
+    failures = []
+    for count, group in enumerate(group_faces(faces, texts), 1):
+        try:
+            engrave_faces(root_comp, group['faces'])
+            engraved += 1
+        except Exception as error:  # not GeneratorExit, when the steps are closed
+            failed_texts = ', '.join(text for _, text in group['faces'])
+            failures.append(f'{group["body"].name} ({failed_texts}): {type(error).__name__}: {error}')
+        yield count
+    return (engraved, failures)
+
+
+def face_normal(face: adsk.fusion.BRepFace) -> adsk.core.Vector3D:
+    """Outward normal of a planar face."""
+    (_, normal) = face.evaluator.getNormalAtPoint(face.pointOnFace)
+    return normal
+
+
+def group_faces(faces: list, texts: list) -> list:
+    """Groups faces that are on the same body and plane, with the same outward normal."""
+    groups = []
+    for face, text in zip(faces, texts):
+        normal = face_normal(face)
+        for group in groups:
+            if (group['body'] == face.body
+                    and group['plane'].isCoPlanarTo(face.geometry)
+                    and group['normal'].dotProduct(normal) > 0):
+                group['faces'].append((face, text))
+                break
+        else:
+            groups.append({'body': face.body, 'plane': face.geometry, 'normal': normal, 'faces': [(face, text)]})
+    return groups
+
+
+def engrave_faces(root_comp: adsk.fusion.Component, faces: list):
+    """Engraves texts on faces on the same body and plane, with one sketch and one cut. faces is a list of (face, text)."""
+    first_face = faces[0][0]
+
+    # Create construction plane on the first face
+    # This will ensure that origo for this sketch is at the center of the face (not relative to the root component)
+    const_plane_input = root_comp.constructionPlanes.createInput()
+    const_plane_input.setByOffset(first_face, adsk.core.ValueInput.createByReal(1))
+    const_plane = root_comp.constructionPlanes.add(const_plane_input)
+
+    # Create sketch on the construction plane
+    sketch = root_comp.sketches.add(const_plane)
+    texts = sketch.sketchTexts
+
+    # Draw a text on sketch for each face
+    text_profiles = adsk.core.ObjectCollection.create()
+    for face, text in faces:
+        if autoTextHeight:
+            # Largest text that fits the largest rectangle inside the face
+            analysis = analyze_face(face)
+            textHeight = fit_text_height(analysis, text)
+            center = sketch.modelToSketchSpace(adsk.core.Point3D.create(*analysis['center']))
+            along = sketch.modelToSketchSpace(adsk.core.Point3D.create(*[c + d for c, d in zip(analysis['center'], analysis['direction'])]))
+            angle = atan2(along.y - center.y, along.x - center.x)
+            half_width, half_height = analysis['width']/2, analysis['height']/2
+        else:
+            # Find shortest edge of face
+            shortest_edge = min([edge.length for edge in face.edges])
+
+            # Update text height parameter
+            textHeight = shortest_edge/10
+            center = sketch.modelToSketchSpace(face.centroid)
+            angle = 0
+            half_width, half_height = 1, 1
+
+        engrave_input = texts.createInput2(formattedText=text, height=textHeight)
+
         # Text customization
         # engrave_input.fontName = 'Harlow Solid Italic'
         # engrave_input.fontName = 'Times New Roman'
-        # engrave_input.angle = 3.1415/2 # pi/2 = 90 deg
+        engrave_input.angle = angle
 
-        # Text placement
-        cornerPointText = adsk.core.Point3D.create(1, 1, 0)
-        diagonalPointText = adsk.core.Point3D.create(-1, -1, 0)
+        # Text placement, centered on the face
+        cornerPointText = adsk.core.Point3D.create(center.x + half_width, center.y + half_height, 0)
+        diagonalPointText = adsk.core.Point3D.create(center.x - half_width, center.y - half_height, 0)
         horizontalAlignmentText = adsk.core.HorizontalAlignments.CenterHorizontalAlignment
         verticalAlignmentText = adsk.core.VerticalAlignments.MiddleVerticalAlignment
         characterSpacing = 0
-        
+
         engrave_input.setAsMultiLine(cornerPointText,
                                      diagonalPointText,
                                      horizontalAlignmentText,
                                      verticalAlignmentText,
                                      characterSpacing)
-        texts.add(engrave_input)
+        text_profiles.add(texts.add(engrave_input))
 
-        # Extrude cut (engrave) text into body
-        text_profile = texts.item(0)  # get text-sketch
-        extInput = root_comp.features.extrudeFeatures.createInput(profile=text_profile, 
-                                                                  operation=adsk.fusion.FeatureOperations.CutFeatureOperation)
-        # Create a to-entity extent definition with offset
-        extent_to_face = adsk.fusion.ToEntityExtentDefinition.create(selected_face.body, 
-                                                                     True,
-                                                                     adsk.core.ValueInput.createByReal(-0.02))
-        # Set the one side extent with the to-entity-extent-definition
-        extInput.setOneSideExtent(extent_to_face, adsk.fusion.ExtentDirections.PositiveExtentDirection)
-        root_comp.features.extrudeFeatures.add(extInput)
+    # Extrude cut (engrave) all texts into body
+    extInput = root_comp.features.extrudeFeatures.createInput(profile=text_profiles,
+                                                              operation=adsk.fusion.FeatureOperations.CutFeatureOperation)
+    # Create a to-entity extent definition with offset
+    extent_to_face = adsk.fusion.ToEntityExtentDefinition.create(first_face.body,
+                                                                 True,
+                                                                 adsk.core.ValueInput.createByReal(-0.02))
+    # Set the one side extent with the to-entity-extent-definition
+    extInput.setOneSideExtent(extent_to_face, adsk.fusion.ExtentDirections.PositiveExtentDirection)
+    root_comp.features.extrudeFeatures.add(extInput)
 
 
-    except:
-        if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+def analyze_face(face: adsk.fusion.BRepFace) -> dict:
+    """
+    Largest rectangle inside a face (center, text direction, width and height), normal and curvature.
+    Cached by face, and stored on the face as an attribute when persistAnalysis is set.
+    The face area and bounding box are stored with the analysis, so it is redone if the face changes.
+    """
+    box = face.boundingBox
+    signature = [round(value, 6) for value in [face.area] + list(box.minPoint.asArray()) + list(box.maxPoint.asArray())]
+    cached = _face_cache.setdefault(tuple(signature), [])
+
+    # Earlier analysis, from this run or stored on the face
+    analysis = next((analysis for (cached_face, analysis) in cached if cached_face == face), None)
+    if analysis is not None:
+        return analysis
+    if persistAnalysis:
+        attribute = face.attributes.itemByName(attributeGroup, 'analysis')
+        if attribute:
+            analysis = json.loads(attribute.value)
+    if analysis is not None and analysis['signature'] == signature:
+        cached.append((face, analysis))
+        return analysis
+
+    # Sample which points of the parametric range are on the face, in (almost) square cells
+    evaluator = face.evaluator
+    param_range = evaluator.parametricRange()
+    u0, v0 = param_range.minPoint.x, param_range.minPoint.y
+    du, dv = param_range.maxPoint.x - u0, param_range.maxPoint.y - v0
+    step = max(du, dv) / analysisSamples
+    nu, nv = max(1, round(du/step)), max(1, round(dv/step))
+    cu, cv = du/nu, dv/nv
+    grid = [[evaluator.isParameterOnFace(adsk.core.Point2D.create(u0 + (i + 0.5)*cu, v0 + (j + 0.5)*cv)) for i in range(nu)]
+            for j in range(nv)]
+
+    # Largest rectangle of cells on the face (the whole range if no samples hit the face)
+    (j0, i0, j1, i1), area = largest_rectangle(grid)
+    if area == 0:
+        (j0, i0, j1, i1) = (0, 0, nv, nu)
+    u_mid, v_mid = u0 + (i0 + i1)/2*cu, v0 + (j0 + j1)/2*cv
+    params = [adsk.core.Point2D.create(u_mid, v_mid),
+              adsk.core.Point2D.create(u0 + i1*cu, v_mid),
+              adsk.core.Point2D.create(u_mid, v0 + j1*cv)]
+    (_, (center, u_side, v_side)) = evaluator.getPointsAtParameters(params)
+
+    # Text goes along the longest side of the rectangle
+    width, height = 2*center.distanceTo(u_side), 2*center.distanceTo(v_side)
+    side = u_side
+    if height > width:
+        width, height = height, width
+        side = v_side
+    direction = center.vectorTo(side)
+    direction.normalize()
+
+    (_, normal) = evaluator.getNormalAtParameter(params[0])
+    (_, _, max_curvature, min_curvature) = evaluator.getCurvature(params[0])
+
+    analysis = {
+        'center': list(center.asArray()),
+        'direction': list(direction.asArray()),
+        'normal': list(normal.asArray()),
+        'width': width,
+        'height': height,
+        'curvature': max(abs(max_curvature), abs(min_curvature)),
+        'signature': signature,
+    }
+    cached.append((face, analysis))
+    if persistAnalysis:
+        face.attributes.add(attributeGroup, 'analysis', json.dumps(analysis))
+    return analysis
+
+
+def largest_rectangle(grid: list) -> tuple:
+    """Largest rectangle of True cells in a grid, as ((row0, col0, row1, col1), area), with row1 and col1 exclusive."""
+    best, best_area = (0, 0, 0, 0), 0
+    heights = [0]*len(grid[0])
+    for row, cells in enumerate(grid):
+        # Height of the column of True cells ending at this row
+        heights = [height + 1 if cell else 0 for height, cell in zip(heights, cells)]
+        # Largest rectangle under the histogram, with a stack of (start column, height)
+        stack = []
+        for col in range(len(heights) + 1):
+            height = heights[col] if col < len(heights) else 0
+            start = col
+            while stack and stack[-1][1] >= height:
+                start, stacked_height = stack.pop()
+                area = stacked_height*(col - start)
+                if area > best_area:
+                    best, best_area = (row - stacked_height + 1, start, row + 1, col), area
+            stack.append((start, height))
+    return best, best_area
+
+
+def fit_text_height(analysis: dict, text: str) -> float:
+    """Largest text height where a single line of text fits inside the analysed rectangle."""
+    return textFill*min(analysis['height'], analysis['width']/(max(len(text), 1)*charWidth))
@@ -1,56 +1,199 @@
 # Author - Sindre E. Hinderaker
 # Description - Generator for creating customized flow-valves
 
-import adsk.core, adsk.fusion, adsk.cam, traceback
-from math import radians, pi, cos, degrees
+import os, sys, re, csv, json, threading
+import adsk.core, adsk.fusion
+from math import radians, cos, sin, degrees
+from . import valve_geometry
+
+scripts_path = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if scripts_path not in sys.path:
+    sys.path.append(scripts_path)  # for the shared helpers
+import tin200_shared as shared
 
 # Global design parameters
 defaultTheta = radians(75) # [deg] angle between sensor-pipe and main-pipe
 defaultD = 40              # [cm] pipe/valve diameter
 
+# Parametric flow-valves are driven by user parameters (FV1_theta, FV1_D, FV1_d and FV1_P).
+# An existing parametric flow-valve can be resized from the command dialog, which only updates the
+# parameter expressions and lets Fusion 360 recompute the valve, instead of building a new valve.
+parametricValve = True
+newValveItem = 'New flow-valve'
+
+# Build engine for new flow-valves:
+#   'timeline' - sketches and extrude features in the timeline (parametric, can be resized)
+#   'brep'     - pipes are built as temporary B-rep bodies and combined in memory, and the valve is added
+#                as a single body (one base feature in parametric designs). Faster, but not parametric.
+buildEngine = 'timeline'
+
+# Batch generation - set batchTable to a CSV- or JSON-file with the columns/keys D, d and theta
+# (D and d in cm, theta in deg) to generate all variants in one run, instead of showing the command dialog.
+batchTable = None
+batchSpacing = 150         # [cm] distance between the generated variants
+# Library of generated variants (Fusion archive files), reused instead of building a variant again.
+# Each build engine has its own sub-folder, since the variants it builds differ.
+libraryPath = os.path.join(os.path.dirname(__file__), 'library')
+# Export each generated variant to exportPath (None, '.step', '.stl' or '.f3d')
+exportType = None
+exportPath = os.path.join(os.path.dirname(__file__), 'export')
+
+# Preview - the preview is only drawn when the inputs have been unchanged for previewDebounce seconds,
+# and is drawn as lightweight custom graphics (center lines and pipe outlines) instead of the full valve.
+previewDebounce = 0.25     # [s]
+previewEventId = 'FlowValvePreviewEvent'
+
 # Global set of event _handlers to keep them referenced for the duration of the command
 _handlers = []
 
-app = adsk.core.Application.get()
-if app:
-    ui = app.userInterface
+# State of the preview: parameters and graphics of the drawn preview, and the pending debounce timer
+_preview = {'params': None, 'graphics': None, 'timer': None, 'due': False, 'command': None}
 
 new_comp = None
 
-def createNewComponent():
+def createNewComponent(transform: adsk.core.Matrix3D = None):
     # Get the active design.
-    product = app.activeProduct
-    design = adsk.fusion.Design.cast(product)
+    design = shared.design()
     root_comp = design.rootComponent
     all_occs = root_comp.occurrences
-    new_occ = all_occs.addNewComponent(adsk.core.Matrix3D.create())
+    new_occ = all_occs.addNewComponent(transform or adsk.core.Matrix3D.create())
     return new_occ.component
 
 
+def readFlowValve(inputs: adsk.core.CommandInputs) -> 'FlowValve':
+    """Creates a flow valve from the command inputs, and updates the transducer distance text."""
+    unitsMgr = shared.design().unitsManager
+    flow_valve = FlowValve()
+    for input in inputs:
+        if input.id == 'valve':
+            if input.selectedItem and input.selectedItem.name != newValveItem:
+                # The sensor-pipe diameter isn't in the dialog, so it is read from the selected valve
+                flow_valve.prefix = input.selectedItem.name
+                flow_valve._d = shared.design().userParameters.itemByName(f'{flow_valve.prefix}_d').value
+        elif input.id == 'theta':
+            flow_valve.theta = unitsMgr.evaluateExpression(input.expression, "deg")
+        elif input.id == 'D':
+            flow_valve.D = unitsMgr.evaluateExpression(input.expression, "cm")
+        elif input.id == 'P':
+            input.formattedText = f'~ {round(flow_valve.P, 2)} cm'
+    return flow_valve
+
+
+def clearPreview():
+    """Removes the preview graphics and cancels a pending preview."""
+    if _preview['timer']:
+        _preview['timer'].cancel()
+        _preview['timer'] = None
+    if _preview['graphics'] and _preview['graphics'].isValid:
+        _preview['graphics'].deleteMe()
+    _preview['graphics'] = None
+    _preview['params'] = None
+    _preview['due'] = False
+
+
 class FlowValveCommandExecuteHandler(adsk.core.CommandEventHandler):
-    """Event handler that reacts to any changes the user makes to any of the command inputs."""
+    """Event handler that builds the flow valve when the user clicks OK."""
     def __init__(self):
         super().__init__()
     def notify(self, args: adsk.core.CommandEventArgs):
         try:
-            unitsMgr = app.activeProduct.unitsManager
             command: adsk.core.Command = args.firingEvent.sender
-            inputs = command.commandInputs
+            flow_valve = readFlowValve(command.commandInputs)
+            clearPreview()
+            if flow_valve.prefix:
+                flow_valve.resize_flow_valve()
+            else:
+                flow_valve.create_flow_valve()
 
-            flow_valve = FlowValve()
-            for input in inputs:
-                if input.id == 'theta':
-                    flow_valve.theta = unitsMgr.evaluateExpression(input.expression, "deg")
-                elif input.id == 'D':
-                    flow_valve.D = unitsMgr.evaluateExpression(input.expression, "cm")
-                elif input.id == 'P':
-                    input.formattedText = f'~ {round(flow_valve.P, 2)} cm'
-            flow_valve.create_flow_valve()
-            args.isValidResult = True
+        except:
+            shared.report_error()
+
+
+class FlowValveCommandPreviewHandler(adsk.core.CommandEventHandler):
+    """
+    Event handler that reacts to any changes the user makes to any of the command inputs.
+    Draws a lightweight preview once the inputs have stopped changing, and skips unchanged inputs.
+    """
+    def __init__(self):
+        super().__init__()
+    def notify(self, args: adsk.core.CommandEventArgs):
+        try:
+            command: adsk.core.Command = args.firingEvent.sender
+            flow_valve = readFlowValve(command.commandInputs)
+            params = (flow_valve.theta, flow_valve.D)
+            if flow_valve.check():
+                return
+
+            # Keep the current preview if the parameters are unchanged
+            graphics = _preview['graphics']
+            if params == _preview['params'] and graphics and graphics.isValid:
+                return
+
+            # Wait until the inputs have stopped changing (restarted on every change)
+            if not _preview['due']:
+                if _preview['timer']:
+                    _preview['timer'].cancel()
+                _preview['command'] = command
+                _preview['timer'] = threading.Timer(previewDebounce, shared.app().fireCustomEvent, [previewEventId])
+                _preview['timer'].daemon = True
+                _preview['timer'].start()
+                return
+
+            # Replace the preview graphics
+            _preview['due'] = False
+            if graphics and graphics.isValid:
+                graphics.deleteMe()
+            design = shared.design()
+            _preview['graphics'] = design.rootComponent.customGraphicsGroups.add()
+            flow_valve.draw_preview(_preview['graphics'])
+            _preview['params'] = params
 
         except:
-            if ui:
-                ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            shared.report_error()
+
+
+class FlowValveCommandValidateInputsHandler(adsk.core.ValidateInputsEventHandler):
+    """Event handler that disables OK, and shows the reason, for flow valves that can't be built."""
+    def __init__(self):
+        super().__init__()
+    def notify(self, args: adsk.core.ValidateInputsEventArgs):
+        try:
+            flow_valve = readFlowValve(args.inputs)
+            reasons = flow_valve.check()
+            if reasons:
+                args.inputs.itemById('P').formattedText = '\n'.join(reasons)
+            args.areInputsValid = not reasons
+        except:
+            shared.report_error()
+
+
+class FlowValveCommandInputChangedHandler(adsk.core.InputChangedEventHandler):
+    """Event handler that loads the parameters of an existing flow-valve when it is selected."""
+    def __init__(self):
+        super().__init__()
+    def notify(self, args: adsk.core.InputChangedEventArgs):
+        try:
+            if args.input.id != 'valve' or args.input.selectedItem.name == newValveItem:
+                return
+            flow_valve = FlowValve.from_parameters(args.input.selectedItem.name)
+            args.inputs.itemById('theta').value = flow_valve.theta
+            args.inputs.itemById('D').value = flow_valve.D
+        except:
+            shared.report_error()
+
+
+class FlowValvePreviewEventHandler(adsk.core.CustomEventHandler):
+    """Event handler for the debounce timer. Runs on the main thread, and fires the preview again."""
+    def __init__(self):
+        super().__init__()
+    def notify(self, args: adsk.core.CustomEventArgs):
+        try:
+            _preview['timer'] = None
+            if _preview['command']:
+                _preview['due'] = True
+                _preview['command'].doExecutePreview()
+        except:
+            shared.report_error()
 
 
 class FlowValveCommandDestroyHandler(adsk.core.CommandEventHandler):
@@ -59,12 +202,16 @@ class FlowValveCommandDestroyHandler(adsk.core.CommandEventHandler):
         super().__init__()
     def notify(self, args: adsk.core.CommandEventArgs):
         try:
+            # remove the preview and the debounce event
+            clearPreview()
+            _preview['command'] = None
+            shared.app().unregisterCustomEvent(previewEventId)
+
             # when the command is done, terminate the script
             # this will release all globals which will remove all event _handlers
             adsk.terminate()
         except:
-            if ui:
-                ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            shared.report_error()
 
 
 class FlowValveCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
@@ -84,11 +231,27 @@ class FlowValveCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             cmd.execute.add(onExecute)
             _handlers.append(onExecute) # keep the handler referenced beyond this function
 
-            # Connect to the command event handler. 
-            onExecutePreview = FlowValveCommandExecuteHandler()
+            # Connect to the command preview handler. 
+            onExecutePreview = FlowValveCommandPreviewHandler()
             cmd.executePreview.add(onExecutePreview)
             _handlers.append(onExecutePreview) # keep the handler referenced beyond this function
 
+            # Connect to the validate inputs event.
+            onValidateInputs = FlowValveCommandValidateInputsHandler()
+            cmd.validateInputs.add(onValidateInputs)
+            _handlers.append(onValidateInputs) # keep the handler referenced beyond this function
+
+            # Connect to the input changed event.
+            onInputChanged = FlowValveCommandInputChangedHandler()
+            cmd.inputChanged.add(onInputChanged)
+            _handlers.append(onInputChanged) # keep the handler referenced beyond this function
+
+            # Connect to the custom event fired by the preview debounce timer.
+            previewEvent = shared.app().registerCustomEvent(previewEventId)
+            onPreviewEvent = FlowValvePreviewEventHandler()
+            previewEvent.add(onPreviewEvent)
+            _handlers.append(onPreviewEvent) # keep the handler referenced beyond this function
+
             # Connect to the command destroyed event.
             onDestroy = FlowValveCommandDestroyHandler()
             cmd.destroy.add(onDestroy)
@@ -101,6 +264,13 @@ class FlowValveCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             _imgInput = inputs.addImageCommandInput('FlowValve', 'Flow valve', 'resources/flow_valve_illustration.png')
             _imgInput.isFullWidth = True
 
+            # Define a drop-down for creating a new flow-valve, or resizing an existing parametric flow-valve
+            if parametricValve:
+                _valveInput = inputs.addDropDownCommandInput('valve', 'Flow valve', adsk.core.DropDownStyles.TextListDropDownStyle)
+                _valveInput.listItems.add(newValveItem, True)
+                for prefix in FlowValve.parametric_valves():
+                    _valveInput.listItems.add(prefix, False)
+
             # Define the value inputs for the command
             _initTheta = adsk.core.ValueInput.createByReal(defaultTheta)
             inputs.addValueInput('theta', 'Angle (θ)', 'deg', _initTheta)
@@ -109,14 +279,16 @@ class FlowValveCommandCreatedHandler(adsk.core.CommandCreatedEventHandler):
             inputs.addValueInput('D', 'Diameter (D)', 'cm', _initD)
             
             # Define a read-only textbox for the command
-            _initP = round(defaultD/cos(pi/2-defaultTheta), 2)
+            _initP = round(valve_geometry.calculate_P(defaultD, defaultTheta), 2)
             inputs.addTextBoxCommandInput('P', 'Transducer distance (P)', f'~ {_initP} cm', 1, True)
         except:
-            if ui:
-                ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+            shared.report_error()
 
 
 class FlowValve():
+    # Number of the next free user parameter prefix (FV1, FV2, ...), in this run of the script
+    _next_prefix = 1
+
     def __init__(self):
         # Design parameters
         self._theta = defaultTheta           # angle between sensor-pipe and main-pipe
@@ -124,6 +296,7 @@ class FlowValve():
         self._d = 15                          # sensor pipe diameter
         # self._P = defaultP                 # distance between transducers
         self._P = self.calculate_P()         # distance between transducers
+        self.prefix = None                   # name prefix of the user parameters of a parametric flow-valve
 
     # Properties
     @property
@@ -151,25 +324,147 @@ class FlowValve():
 
     # Methods
     def calculate_P(self):
-        self._P = self._D/cos(pi/2-self._theta)
+        self._P = valve_geometry.calculate_P(self._D, self._theta)
         return self._P
+
+    def check(self) -> list:
+        """Returns the reasons the flow valve can't be built (an empty list if it is valid)."""
+        return valve_geometry.check(self.D, self._d, self.theta)
+
+    @staticmethod
+    def parametric_valves() -> list:
+        """Name prefixes of the parametric flow-valves in the active design."""
+        design = shared.design()
+        prefixes = []
+        for param in design.userParameters:
+            match = re.match(r'^(FV\d+)_P$', param.name)
+            if match:
+                prefixes.append(match.group(1))
+        return prefixes
+
+    @staticmethod
+    def from_parameters(prefix: str) -> 'FlowValve':
+        """Creates a flow valve from the user parameters of a parametric flow-valve."""
+        params = shared.design().userParameters
+        flow_valve = FlowValve()
+        flow_valve.theta = params.itemByName(f'{prefix}_theta').value
+        flow_valve.D = params.itemByName(f'{prefix}_D').value
+        flow_valve._d = params.itemByName(f'{prefix}_d').value
+        flow_valve.calculate_P()
+        flow_valve.prefix = prefix
+        return flow_valve
+
+    def create_parameters(self):
+        """Creates the user parameters of a new parametric flow-valve."""
+        params = shared.design().userParameters
+        # Continue from the last created prefix, instead of searching from FV1 for every valve in a batch
+        n = FlowValve._next_prefix
+        while params.itemByName(f'FV{n}_P'):
+            n += 1
+        FlowValve._next_prefix = n + 1
+        p = self.prefix = f'FV{n}'
+        params.add(f'{p}_theta', adsk.core.ValueInput.createByString(f'{degrees(self.theta)} deg'), 'deg', 'Flow-valve: angle between sensor-pipe and main-pipe')
+        params.add(f'{p}_D', adsk.core.ValueInput.createByString(f'{self.D} cm'), 'cm', 'Flow-valve: main-pipe diameter')
+        params.add(f'{p}_d', adsk.core.ValueInput.createByString(f'{self._d} cm'), 'cm', 'Flow-valve: sensor-pipe diameter')
+        params.add(f'{p}_P', adsk.core.ValueInput.createByString(f'{p}_D / cos(90 deg - {p}_theta)'), 'cm', 'Flow-valve: distance between transducers')
+
+    def resize_flow_valve(self):
+        """Resizes an existing parametric flow-valve by updating its user parameters."""
+        design = shared.design()
+        params = design.userParameters
+        p = self.prefix
+
+        # Update both parameters with a single recompute
+        theta_param = params.itemByName(f'{p}_theta')
+        D_param = params.itemByName(f'{p}_D')
+        values = [adsk.core.ValueInput.createByString(f'{degrees(self.theta)} deg'),
+                  adsk.core.ValueInput.createByString(f'{self.D} cm')]
+        if hasattr(design, 'modifyParameters'):
+            design.modifyParameters([theta_param, D_param], values)
+        else:
+            theta_param.expression = values[0].stringValue
+            D_param.expression = values[1].stringValue
+
+        # Rename the component of the flow-valve
+        for attribute in design.findAttributes('FlowValve', 'prefix'):
+            if attribute.value == p and attribute.parent:
+                attribute.parent.name = self.component_name()
+
+    def component_name(self) -> str:
+        return f'Flow-valve (D{self.D}cm θ{degrees(self.theta)}deg)'
+
+    def value(self, expression: str, real: float) -> adsk.core.ValueInput:
+        """Value input from a parameter expression for parametric flow-valves, otherwise from the computed value."""
+        if self.prefix:
+            return adsk.core.ValueInput.createByString(expression.format(p=self.prefix))
+        return adsk.core.ValueInput.createByReal(real)
+
+    def dimension(self, sketch: adsk.fusion.Sketch, circle: adsk.fusion.SketchCircle, expression: str):
+        """Drives the diameter of a sketch circle by a parameter expression, for parametric flow-valves."""
+        if not self.prefix:
+            return
+        text_point = circle.centerSketchPoint.geometry.copy()
+        text_point.translateBy(adsk.core.Vector3D.create(circle.radius, circle.radius, 0))
+        diameter = sketch.sketchDimensions.addDiameterDimension(circle, text_point)
+        diameter.parameter.expression = expression.format(p=self.prefix)
     
-    def create_flow_valve(self):
+    def sensor_axis(self) -> adsk.core.Vector3D:
+        """Direction of the sensor-pipe, the normal of the XY-plane rotated by theta around the X-axis."""
+        return adsk.core.Vector3D.create(0, -sin(self.theta), cos(self.theta))
+
+    def draw_preview(self, graphics: adsk.fusion.CustomGraphicsGroup):
+        """Draws the center lines and pipe outlines of the flow valve as custom graphics."""
+        center = adsk.core.Point3D.create(0, 0, 0)
+        axes = [
+            # axis, pipe diameter, half length of pipe
+            (adsk.core.Vector3D.create(0, 0, 1), self.D, self.P/2 + 70*3/2),   # main pipe
+            (self.sensor_axis(), self._d, self.P/2 + 70),                      # sensor pipe
+        ]
+        for axis, diameter, length in axes:
+            ends = []
+            for sign in (1, -1):
+                end = center.copy()
+                offset = axis.copy()
+                offset.scaleBy(sign*length)
+                end.translateBy(offset)
+                ends.append(end)
+
+                # Outer and inner circle at the pipe end
+                graphics.addCurve(adsk.core.Circle3D.createByCenter(end, axis, diameter/2))
+                graphics.addCurve(adsk.core.Circle3D.createByCenter(end, axis, diameter/2 - diameter/10))
+
+            # Center line
+            graphics.addCurve(adsk.core.Line3D.create(ends[0], ends[1]))
+
+    def library_key(self) -> str:
+        """Name of the flow valve in the library, from its parameters."""
+        return f'FlowValve D{self.D:g}cm d{self._d:g}cm theta{round(degrees(self.theta), 6):g}deg'
+
+    def create_flow_valve(self, transform: adsk.core.Matrix3D = None, engine: str = None) -> adsk.fusion.Component:
         """Creates and builds the flow valve based on specified property values"""
+        if (engine or buildEngine) == 'brep':
+            return self.create_flow_valve_brep(transform)
 
-        new_comp = createNewComponent()
+        new_comp = createNewComponent(transform)
         if new_comp is None:
-            ui.messageBox('New component failed to create', 'New Component Failed')
+            shared.ui().messageBox('New component failed to create', 'New Component Failed')
             return
 
-        new_comp.name = f'Flow-valve (D{self.D}cm θ{degrees(self.theta)}deg)'
+        new_comp.name = self.component_name()
+
+        # Parametric flow-valves are driven by user parameters (only supported in parametric designs)
+        design = shared.design()
+        if parametricValve and design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            self.create_parameters()
+            new_comp.attributes.add('FlowValve', 'prefix', self.prefix)
+
         # Defining a global center point
         center_global = new_comp.originConstructionPoint.geometry
 
         # SENSOR PIPE ------------------------------------------------------------------
         # Create angled construction plane
         const_plane_sp_input = new_comp.constructionPlanes.createInput()
-        const_plane_sp_input.setByAngle(linearEntity=new_comp.xConstructionAxis, angle=adsk.core.ValueInput.createByReal(self.theta), planarEntity=new_comp.xYConstructionPlane)
+        const_plane_sp_input.setByAngle(linearEntity=new_comp.xConstructionAxis, angle=self.value('{p}_theta', self.theta), planarEntity=new_comp.xYConstructionPlane)
         const_plane_sp = new_comp.constructionPlanes.add(const_plane_sp_input)
 
         # Create sketch on angled construction plane and center point for sketch
@@ -182,11 +477,14 @@ class FlowValve():
         circle_sp_o = circles_sp.addByCenterRadius(centerPoint=center_sp, radius=self._d/2)
         # Draw inner circle
         circle_sp_i = circles_sp.addByCenterRadius(centerPoint=circle_sp_o.centerSketchPoint, radius=self._d/2-self._d/10)
+        # Drive the circles by parameters
+        self.dimension(sketch_sp, circle_sp_o, '{p}_d')
+        self.dimension(sketch_sp, circle_sp_i, '{p}_d * 0.8')
 
         # Extrude (new body)
         pipe_sp_profile = sketch_sp.profiles.item(0)  # get the pipe profile (profile between inner and outer circle)
         ext_pipe_sp_input = new_comp.features.extrudeFeatures.createInput(profile=pipe_sp_profile, operation=adsk.fusion.FeatureOperations.NewBodyFeatureOperation)
-        ext_pipe_sp_input.setDistanceExtent(isSymmetric=True, distance=adsk.core.ValueInput.createByReal(self.P/2 + 70))
+        ext_pipe_sp_input.setDistanceExtent(isSymmetric=True, distance=self.value('{p}_P / 2 + 70 cm', self.P/2 + 70))
         new_comp.features.extrudeFeatures.add(ext_pipe_sp_input)
         # ------------------------------------------------------------------------------
         
@@ -202,19 +500,22 @@ class FlowValve():
         circle_mp_o = circles_mp.addByCenterRadius(centerPoint=center_mp, radius=self.D/2)
         # Draw inner circle
         circle_mp_i = circles_mp.addByCenterRadius(centerPoint=circle_mp_o.centerSketchPoint, radius=self.D/2-self.D/10)
+        # Drive the circles by parameters
+        self.dimension(sketch_mp, circle_mp_o, '{p}_D')
+        self.dimension(sketch_mp, circle_mp_i, '{p}_D * 0.8')
 
         # Create object collection of profiles and extrude cut
         profiles_mp = adsk.core.ObjectCollection.create()
         [profiles_mp.add(profile) for profile in sketch_mp.profiles]
         ext_pipe_mp_cut_input = new_comp.features.extrudeFeatures.createInput(profile=profiles_mp, operation=adsk.fusion.FeatureOperations.CutFeatureOperation)
         # ext_pipe_mp_cut_input.setAllExtent(direction=adsk.fusion.ExtentDirections.SymmetricExtentDirection)  # does not extrude symmetric for some reason...
-        ext_pipe_mp_cut_input.setDistanceExtent(isSymmetric=True, distance=adsk.core.ValueInput.createByReal(self.P/2 + 70*3))
+        ext_pipe_mp_cut_input.setDistanceExtent(isSymmetric=True, distance=self.value('{p}_P / 2 + 70 cm * 3', self.P/2 + 70*3))
         new_comp.features.extrudeFeatures.add(ext_pipe_mp_cut_input)
 
         # Extrude join pipe profile
         pipe_mp_profile = sketch_mp.profiles.item(0)  # get the pipe profile (profile between inner and outer circle)
         ext_pipe_mp_join_input = new_comp.features.extrudeFeatures.createInput(profile=pipe_mp_profile, operation=adsk.fusion.FeatureOperations.JoinFeatureOperation)
-        ext_pipe_mp_join_input.setDistanceExtent(isSymmetric=True, distance=adsk.core.ValueInput.createByReal(self.P/2 + 70*3/2))
+        ext_pipe_mp_join_input.setDistanceExtent(isSymmetric=True, distance=self.value('{p}_P / 2 + 70 cm * 3 / 2', self.P/2 + 70*3/2))
         new_comp.features.extrudeFeatures.add(ext_pipe_mp_join_input)
         # ------------------------------------------------------------------------------
 
@@ -223,15 +524,200 @@ class FlowValve():
         pipe_sp_profile_i = sketch_sp.profiles.item(1)  # get the center profile (profile by inner circle)
         ext_pipe_sp_i_input = new_comp.features.extrudeFeatures.createInput(profile=pipe_sp_profile_i, operation=adsk.fusion.FeatureOperations.CutFeatureOperation)
         # ext_pipe_sp_i_input.setAllExtent(direction=adsk.fusion.ExtentDirections.SymmetricExtentDirection)  # does not extrude symmetric for some reason...
-        ext_pipe_sp_i_input.setDistanceExtent(isSymmetric=True, distance=adsk.core.ValueInput.createByReal(self.P/2 + 70*3))
+        ext_pipe_sp_i_input.setDistanceExtent(isSymmetric=True, distance=self.value('{p}_P / 2 + 70 cm * 3', self.P/2 + 70*3))
         new_comp.features.extrudeFeatures.add(ext_pipe_sp_i_input)
+
+        return new_comp
+
+    def create_flow_valve_brep(self, transform: adsk.core.Matrix3D = None) -> adsk.fusion.Component:
+        """
+        Builds the same flow valve as create_flow_valve with temporary B-rep bodies. The pipes are
+        combined in memory, and only the finished valve is added to the component.
+        """
+        new_comp = createNewComponent(transform)
+        if new_comp is None:
+            shared.ui().messageBox('New component failed to create', 'New Component Failed')
+            return
+
+        new_comp.name = self.component_name()
+        temp_brep = adsk.fusion.TemporaryBRepManager.get()
+        difference = adsk.fusion.BooleanTypes.DifferenceBooleanType
+        union = adsk.fusion.BooleanTypes.UnionBooleanType
+        geometry = valve_geometry.evaluate(self.D, self._d, self.theta)
+
+        main_axis = adsk.core.Vector3D.create(0, 0, 1)
+        sensor_axis = self.sensor_axis()
+
+        def cylinder(axis: adsk.core.Vector3D, diameter: float, half_length: float) -> adsk.fusion.BRepBody:
+            """Cylinder centered at the origin, like a symmetric extrude of a circle."""
+            ends = []
+            for sign in (-1, 1):
+                end = adsk.core.Point3D.create(0, 0, 0)
+                offset = axis.copy()
+                offset.scaleBy(sign*half_length)
+                end.translateBy(offset)
+                ends.append(end)
+            return temp_brep.createCylinderOrCone(ends[0], diameter/2, ends[1], diameter/2)
+
+        def pipe(axis: adsk.core.Vector3D, diameter: float, half_length: float) -> adsk.fusion.BRepBody:
+            """Pipe with wall thickness diameter/10, like a symmetric extrude of the profile between two circles."""
+            body = cylinder(axis, diameter, half_length)
+            # The inner cylinder is longer, to avoid coplanar end faces in the boolean operation
+            temp_brep.booleanOperation(body, cylinder(axis, diameter - 2*diameter/10, half_length + 1), difference)
+            return body
+
+        # SENSOR PIPE (new body)
+        valve = pipe(sensor_axis, self._d, geometry['sensor_length'])
+
+        # MAIN PIPE: cut the main pipe cross-section, and join the main pipe
+        temp_brep.booleanOperation(valve, cylinder(main_axis, self.D, geometry['cut_length']), difference)
+        temp_brep.booleanOperation(valve, pipe(main_axis, self.D, geometry['main_length']), union)
+
+        # Cut the center of the SENSOR PIPE, to "open" MAIN PIPE
+        temp_brep.booleanOperation(valve, cylinder(sensor_axis, self._d - 2*self._d/10, geometry['cut_length']), difference)
+
+        # Add the valve as a single body (parametric designs require a base feature for B-rep bodies)
+        design = shared.design()
+        if design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+            base_feature = new_comp.features.baseFeatures.add()
+            base_feature.startEdit()
+            new_comp.bRepBodies.add(valve, base_feature)
+            base_feature.finishEdit()
+        else:
+            new_comp.bRepBodies.add(valve)
+
+        return new_comp
+
+
+def readBatchTable(path: str) -> list:
+    """Reads the flow-valve variants from a CSV- or JSON-file, as a list of (D, d, theta) in cm and deg."""
+    if path.lower().endswith('.json'):
+        with open(path) as f:
+            rows = json.load(f)
+    else:
+        with open(path, newline='') as f:
+            rows = list(csv.DictReader(f))
+    return [(float(row['D']), float(row.get('d') or 15), float(row['theta'])) for row in rows]
+
+
+def exportComponent(component: adsk.fusion.Component, path: str, file_type: str):
+    """Exports a component to a STEP-, STL- or Fusion archive file."""
+    exp_manager = shared.design().exportManager
+    if file_type == '.step':
+        exp_options = exp_manager.createSTEPExportOptions(path, component)
+    elif file_type == '.stl':
+        exp_options = exp_manager.createSTLExportOptions(component, path)
+    elif file_type == '.f3d':
+        exp_options = exp_manager.createFusionArchiveExportOptions(path, component)
+    else:
+        raise ValueError(f'Unsupported file-type: "{file_type}"')
+    exp_manager.execute(exp_options)
+
+
+def createBatch(table_path: str):
+    """
+    Generates every flow-valve variant in the table, placed in a row along the X-axis.
+    A variant is only built once: repeated variants are added as copies of the built component,
+    and variants found in the library are imported instead of built.
+    """
+    for _ in createBatchSteps(table_path):
+        pass
+
+
+def libraryFolder(design: adsk.fusion.Design) -> str:
+    """Library sub-folder for the variants of the current build engine (timeline, parametric or not, or B-rep)."""
+    if buildEngine == 'brep':
+        return os.path.join(libraryPath, 'brep')
+    if parametricValve and design.designType == adsk.fusion.DesignTypes.ParametricDesignType:
+        return os.path.join(libraryPath, 'timeline-parametric')
+    return os.path.join(libraryPath, 'timeline')
+
+
+def createBatchSteps(table_path: str):
+    """
+    Generates the batch like createBatch, as a generator that yields after each variant, so the batch can
+    also be run in slices (see Extra/JobScheduler.py). Returns the counts of built, imported and copied variants.
+    """
+    design = shared.design()
+    root_comp = design.rootComponent
+    import_manager = shared.app().importManager
+    library_path = libraryFolder(design)
+    os.makedirs(library_path, exist_ok=True)
+    if exportType:
+        os.makedirs(exportPath, exist_ok=True)
+
+    components = {}  # library key -> generated component
+    results = {'built': 0, 'library': 0, 'copied': 0}
+    failed = []
+    for i, (D, d, theta) in enumerate(readBatchTable(table_path)):
+        try:
+            flow_valve = FlowValve()
+            flow_valve.D = D
+            flow_valve._d = d
+            flow_valve.theta = radians(theta)
+            key = flow_valve.library_key()
+
+            # Skip variants that can't be built, before any CAD work
+            reasons = flow_valve.check()
+            if reasons:
+                failed.append(f'Row {i + 1} (D={D}, d={d}, theta={theta}): {"; ".join(reasons)}')
+                continue
+
+            transform = adsk.core.Matrix3D.create()
+            transform.translation = adsk.core.Vector3D.create(i*batchSpacing, 0, 0)
+
+            # Copy variants already generated in this run
+            if key in components:
+                root_comp.occurrences.addExistingComponent(components[key], transform)
+                results['copied'] += 1
+                continue
+
+            library_file = os.path.join(library_path, key + '.f3d')
+            if os.path.exists(library_file):
+                # Import the variant from the library
+                import_options = import_manager.createFusionArchiveImportOptions(library_file)
+                occurrence = import_manager.importToTarget2(import_options, root_comp).item(0)
+                occurrence.transform = transform
+                component = occurrence.component
+                results['library'] += 1
+            else:
+                # Build the variant, and save it to the library
+                component = flow_valve.create_flow_valve(transform)
+                exportComponent(component, library_file, '.f3d')
+                results['built'] += 1
+            components[key] = component
+
+            if exportType:
+                exportComponent(component, os.path.join(exportPath, key + exportType), exportType)
+        except Exception as error:
+            failed.append(f'Row {i + 1} (D={D}, d={d}, theta={theta}): {type(error).__name__}: {error}')
+        yield
+
+    # Keep the positions of imported variants in parametric designs
+    if design.snapshots.hasPendingSnapshot:
+        design.snapshots.add()
+
+    message = (f'Generated {results["built"] + results["library"] + results["copied"]} flow-valves\n'
+               f'Built: {results["built"]}\n'
+               f'From library: {results["library"]}\n'
+               f'Copied: {results["copied"]}')
+    if failed:
+        message += f'\nFailed: {len(failed)}\n' + '\n'.join(failed)
+    shared.ui().messageBox(message)
+    return dict(results, failed=len(failed))
         
 
 # ------------------------------------------------------------------------------
 
 def run(context):
     try:
+        # Generate variants from a table, without the command dialog
+        if batchTable:
+            createBatch(batchTable)
+            return
+
         # Get the existing command definition or create it if it doesn't already exist.
+        ui = shared.ui()
         cmdDef = ui.commandDefinitions.itemById('FlowValve')
         if not cmdDef:
             cmdDef = ui.commandDefinitions.addButtonDefinition('FlowValve', 'Create Flow-Valve', 'Create a customized flow-valve.', './resources') # relative resource file path is specified
@@ -248,5 +734,4 @@ def run(context):
         # prevent this module from being terminate when the script returns, because we are waiting for event _handlers to fire
         adsk.autoTerminate(False)
     except:
-        if ui:
-            ui.messageBox('Failed:\n{}'.format(traceback.format_exc()))
+        shared.report_error()
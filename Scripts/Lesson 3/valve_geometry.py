@@ -0,0 +1,161 @@
+# Author - Sindre E. Hinderaker
+# Description - Flow-valve geometry and validation, without Fusion 360.
+#               Evaluates single flow-valves, or (with NumPy) whole grids of (D, d, theta) in one call.
+#               Run from a terminal to screen a range of sizes, e.g.:
+#               python valve_geometry.py --D 20:60:5 --d 5:20:2.5 --theta 30:90:5
+
+import sys, itertools
+from math import radians, degrees, sin, inf
+
+# NumPy is imported the first time arrays are evaluated, since it is slow to import. It is not included with
+# Fusion 360, single values are evaluated without it.
+np = None
+_numpy_imported = False
+
+# Validation limits
+minTheta = radians(10)  # [rad] smaller angles make the transducer distance (P) blow up
+maxTheta = radians(90)  # [rad]
+minWall = 0.2           # [cm] minimum wall thickness of both pipes
+
+# Pipe lengths relative to the transducer distance, as used by the flow-valve generator
+sensorPipeExtra = 70    # [cm]
+
+
+def calculate_P(D, theta):
+    """Distance between transducers, D / cos(pi/2 - theta) = D / sin(theta)."""
+    return _divide(D, _sin(theta))
+
+
+def evaluate(D, d, theta) -> dict:
+    """
+    Evaluates the flow-valve geometry for main-pipe diameter D, sensor-pipe diameter d (cm)
+    and angle theta (rad). Takes single values, or NumPy arrays that broadcast together.
+    """
+    if _is_array(D, d, theta):
+        np = _numpy()
+        D, d, theta = np.broadcast_arrays(np.asarray(D, float), np.asarray(d, float), np.asarray(theta, float))
+
+    P = calculate_P(D, theta)
+    geometry = {
+        'D': D,
+        'd': d,
+        'theta': theta,
+        'P': P,
+        # Half lengths of the symmetric extrudes
+        'sensor_length': P/2 + sensorPipeExtra,
+        'main_length': P/2 + sensorPipeExtra*3/2,
+        'cut_length': P/2 + sensorPipeExtra*3,
+        # Wall thickness and inner diameter of the pipes
+        'main_wall': D/10,
+        'sensor_wall': d/10,
+        'main_bore': D - 2*D/10,
+        # Space between the sensor-pipe and the main-pipe bore
+        'clearance': (D - 2*D/10) - d,
+    }
+
+    # Checks, and combined validity
+    geometry['theta_ok'] = (theta >= minTheta) & (theta <= maxTheta)
+    geometry['wall_ok'] = (D/10 >= minWall) & (d/10 >= minWall)
+    geometry['clearance_ok'] = geometry['clearance'] > 0
+    geometry['valid'] = geometry['theta_ok'] & geometry['wall_ok'] & geometry['clearance_ok']
+    return geometry
+
+
+def check(D: float, d: float, theta: float) -> list:
+    """Returns the reasons a single flow-valve is invalid (an empty list if it is valid)."""
+    geometry = evaluate(D, d, theta)
+    reasons = []
+    if not geometry['theta_ok']:
+        reasons.append(f'Angle must be between {degrees(minTheta):g} and {degrees(maxTheta):g} deg')
+    if not geometry['wall_ok']:
+        reasons.append(f'Pipe walls (D/10 and d/10) must be at least {minWall:g} cm')
+    if not geometry['clearance_ok']:
+        reasons.append(f'Sensor-pipe diameter (d = {d:g} cm) must be smaller than the main-pipe bore ({geometry["main_bore"]:g} cm)')
+    return reasons
+
+
+def grid(D_values, d_values, theta_values) -> dict:
+    """
+    Evaluates every combination of the given D, d and theta values (theta in rad).
+    Returns flat columns in the order of itertools.product(D_values, d_values, theta_values).
+    """
+    np = _numpy()
+    if np is not None:
+        D, d, theta = np.meshgrid(np.asarray(D_values, float),
+                                  np.asarray(d_values, float),
+                                  np.asarray(theta_values, float),
+                                  indexing='ij')
+        return evaluate(D.ravel(), d.ravel(), theta.ravel())
+
+    # Without NumPy, evaluate one combination at a time
+    rows = [evaluate(D, d, theta) for D, d, theta in itertools.product(D_values, d_values, theta_values)]
+    keys = rows[0].keys() if rows else []
+    return {key: [row[key] for row in rows] for key in keys}
+
+
+def valid_combinations(geometry: dict) -> list:
+    """The (D, d, theta) combinations of an evaluated grid that are valid."""
+    return [(D, d, theta) for D, d, theta, valid in
+            zip(geometry['D'], geometry['d'], geometry['theta'], geometry['valid']) if valid]
+
+
+def _numpy():
+    """NumPy (imported on first use), or None without NumPy."""
+    global np, _numpy_imported
+    if not _numpy_imported:
+        _numpy_imported = True
+        try:
+            import numpy as np
+        except ImportError:
+            np = None
+    return np
+
+
+def _is_ndarray(value) -> bool:
+    # Only an imported NumPy makes arrays, so single values are checked without importing it
+    return 'numpy' in sys.modules and isinstance(value, _numpy().ndarray)
+
+
+def _is_array(*values) -> bool:
+    if any(isinstance(value, (list, tuple)) for value in values):
+        return _numpy() is not None
+    return any(_is_ndarray(value) for value in values)
+
+
+def _sin(value):
+    if _is_ndarray(value):
+        return np.sin(value)
+    return sin(value)
+
+
+def _divide(numerator, denominator):
+    if _is_ndarray(denominator):
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(denominator > 0, numerator / np.where(denominator > 0, denominator, 1), inf)
+    return numerator / denominator if denominator > 0 else inf
+
+
+def _range(text: str) -> list:
+    """Values from 'start:stop:step' (stop included), or a single value."""
+    if ':' not in text:
+        return [float(text)]
+    start, stop, step = (float(value) for value in text.split(':'))
+    count = int(round((stop - start) / step)) + 1
+    return [start + i*step for i in range(count)]
+
+
+if __name__ == '__main__':
+    import argparse
+    parser = argparse.ArgumentParser(description='Screen flow-valve sizes before generating them in Fusion 360.')
+    parser.add_argument('--D', default='40', help='main-pipe diameters in cm, value or start:stop:step')
+    parser.add_argument('--d', default='15', help='sensor-pipe diameters in cm, value or start:stop:step')
+    parser.add_argument('--theta', default='75', help='angles in deg, value or start:stop:step')
+    args = parser.parse_args()
+
+    geometry = grid(_range(args.D), _range(args.d), [radians(theta) for theta in _range(args.theta)])
+    valid = valid_combinations(geometry)
+    print(f'{len(geometry["valid"])} combinations, {len(valid)} valid')
+    for check_name in ('theta_ok', 'wall_ok', 'clearance_ok'):
+        print(f'  failing {check_name}: {sum(1 for ok in geometry[check_name] if not ok)}')
+    for D, d, theta in valid[:20]:
+        print(f'  D={D:g} cm  d={d:g} cm  theta={degrees(theta):g} deg  P={calculate_P(D, theta):.2f} cm')
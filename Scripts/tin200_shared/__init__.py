@@ -0,0 +1,115 @@
+# Author - Sindre E. Hinderaker
+# Description - Helpers shared by the scripts: modules imported on first use, cached application, user interface
+#               and design handles, one way to report errors, and loading a script as a module. Kept small and
+#               free of heavy imports, since every script imports it when it is started. All scripts and add-ins
+#               share one Python interpreter in Fusion 360, so the package has a name other add-ins won't use.
+#               Scripts import it with:
+#               sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))  # the Scripts folder
+#               import tin200_shared as shared
+
+import os, re, sys, types, threading, importlib, importlib.util
+
+# Handles that live as long as Fusion 360 (the design is checked against the active product when it is used)
+_handles = {'app': None, 'ui': None, 'design': None}
+
+
+# LAZY IMPORTS -----------------------------------------------------------------
+
+class LazyModule(types.ModuleType):
+    """Stands in for a module, and imports it when one of its attributes is used for the first time."""
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__['_module'] = None
+        self.__dict__['_lock'] = threading.Lock()
+
+    def __getattr__(self, attribute: str):
+        module = self._module
+        if module is None:
+            with self._lock:
+                if self._module is None:
+                    self.__dict__['_module'] = importlib.import_module(self.__name__)
+                module = self._module
+        return getattr(module, attribute)
+
+
+def lazy_import(name: str) -> types.ModuleType:
+    """
+    Module that is imported on first use, e.g. zipfile = lazy_import('zipfile'). Use it for heavy modules that
+    are only needed by some runs of a script, so starting the script doesn't wait for them.
+    """
+    return sys.modules.get(name) or LazyModule(name)
+
+
+# adsk.cam is only imported by scripts that use it (shared.cam)
+cam = lazy_import('adsk.cam')
+
+
+# APPLICATION HANDLES ----------------------------------------------------------
+
+def app():
+    """The Fusion 360 application (looked up once)."""
+    if _handles['app'] is None:
+        import adsk.core
+        _handles['app'] = adsk.core.Application.get()
+    return _handles['app']
+
+
+def ui():
+    """The user interface of Fusion 360 (looked up once)."""
+    if _handles['ui'] is None:
+        _handles['ui'] = app().userInterface
+    return _handles['ui']
+
+
+def design():
+    """The active design, or None if the active product isn't a design (e.g. in the CAM workspace)."""
+    product = app().activeProduct
+    cached = _handles['design']
+    if cached is None or cached != product:
+        import adsk.fusion
+        cached = _handles['design'] = adsk.fusion.Design.cast(product)
+    return cached
+
+
+def reset_handles():
+    """Forgets the cached handles, e.g. for a new application in the benchmarks."""
+    _handles.update(app=None, ui=None, design=None)
+
+
+# REPORTING --------------------------------------------------------------------
+
+def report(message: str, title: str = ''):
+    """Shows a message to the user (printed instead, when there is no user interface)."""
+    try:
+        ui().messageBox(message, title)
+    except:
+        print(message)
+
+
+def report_error():
+    """Reports the exception being handled, with its traceback. Call it from an except block."""
+    import traceback
+    report('Failed:\n{}'.format(traceback.format_exc()))
+
+
+# SCRIPTS ----------------------------------------------------------------------
+
+def load_script(path: str, prefix: str = 'scripts_') -> types.ModuleType:
+    """
+    Imports a new copy of a script as a module, in a package for its folder like Fusion 360 does (so relative
+    imports work). The package is named after the folder, with the given prefix.
+    """
+    folder = os.path.dirname(path)
+    package = prefix + re.sub(r'\W', '_', os.path.basename(folder))
+    for name in [name for name in sys.modules if name == package or name.startswith(package + '.')]:
+        del sys.modules[name]
+    package_module = types.ModuleType(package)
+    package_module.__path__ = [folder]
+    sys.modules[package] = package_module
+
+    name = f'{package}.{os.path.splitext(os.path.basename(path))[0]}'
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    spec.loader.exec_module(module)
+    return module